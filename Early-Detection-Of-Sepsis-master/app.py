@@ -1,190 +1,202 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import os
 import numpy as np
 import pandas as pd
-from flask import Flask, request, render_template
-import pickle
+from flask import Flask, request, render_template, jsonify
 import warnings
+from clinical_rules import ClinicalRuleEngine
+from model_registry import ModelRegistry, BASE_FEATURES, TREND_FEATURES
+from trend_features import OnlineTrendFeatures, SqliteTrendStore
 warnings.filterwarnings('ignore')
 
 
 app = Flask(__name__, template_folder='templates', static_folder='static', static_url_path='/static')
 
-# Try to load calibrated model (Random Forest with probability scaling)
-scaling_params = None
-try:
-    model = pickle.load(open('model_calibrated.pkl', 'rb'))
-    scaler = pickle.load(open('scaler_calibrated.pkl', 'rb'))
-    try:
-        scaling_params = pickle.load(open('scaling_params.pkl', 'rb'))
-    except:
-        scaling_params = None
-    print("[INFO] Using Random Forest with linear probability scaling")
-except:
-    # Fallback to Phase 1 model
-    try:
-        model = pickle.load(open('model_phase2.pkl', 'rb'))
-        if model.n_features_in_ == 43:
-            print("[INFO] Phase 2 model requires trend features - switching to Phase 1")
-            model = pickle.load(open('model.pkl', 'rb'))
-        else:
-            print("[INFO] Using Phase 2 model")
-    except:
-        model = pickle.load(open('model.pkl', 'rb'))
-        scaler = pickle.load(open('scaler.pkl', 'rb'))
-        print("[INFO] Using Phase 1 model")
-
-# Load Phase 2 threshold info if available (for reference only)
-try:
-    threshold_info = pickle.load(open('threshold_info.pkl', 'rb'))
-    optimal_threshold = threshold_info.get('optimal_threshold', 0.5)
-except:
-    threshold_info = None
-    optimal_threshold = 0.5
-
 # Base features (27 features)
-FEATURE_NAMES = [
-    'HR', 'O2Sat', 'Temp', 'SBP', 'MAP', 'DBP', 'Resp',
-    'BaseExcess', 'HCO3', 'FiO2', 'PaCO2', 'SaO2', 'Creatinine',
-    'Bilirubin_direct', 'Glucose', 'Lactate', 'Magnesium', 'Phosphate',
-    'Bilirubin_total', 'Hgb', 'WBC', 'Fibrinogen', 'Platelets',
-    'Age', 'Gender', 'HospAdmTime', 'ICULOS'
-]
-
-# Phase 2 trend features (optional)
-TREND_FEATURES = [
-    'HR_trend_1h', 'HR_volatility', 'O2Sat_trend_1h', 'O2Sat_volatility',
-    'Temp_trend_1h', 'Temp_volatility', 'Lactate_trend_1h', 'Lactate_volatility',
-    'SBP_trend_1h', 'SBP_volatility', 'Creatinine_trend_1h', 'Creatinine_volatility',
-    'WBC_trend_1h', 'WBC_volatility', 'Glucose_trend_1h', 'Glucose_volatility'
-]
-
-# Clinical reference ranges for warning indicators
-CLINICAL_RANGES = {
-    'HR': (60, 100, 'beats/min'),
-    'O2Sat': (95, 100, '%'),
-    'Temp': (36.5, 37.5, '°C'),
-    'SBP': (90, 120, 'mm Hg'),
-    'MAP': (70, 100, 'mm Hg'),
-    'DBP': (60, 80, 'mm Hg'),
-    'Resp': (12, 20, 'breaths/min'),
-    'Lactate': (0.5, 2.0, 'mmol/L'),
-    'Glucose': (70, 100, 'mg/dL'),
-    'Creatinine': (0.7, 1.3, 'mg/dL'),
-    'WBC': (4.5, 11, 'K/µL'),
-    'Hgb': (13.5, 17.5, 'g/dL'),
-}
+FEATURE_NAMES = BASE_FEATURES
+# Request field identifying the patient, so trend features can follow each stay
+PATIENT_ID_FIELD = 'patient_id'
+# Per-patient trend state shared by all gunicorn workers (any worker may get a patient's next hour)
+TREND_STORE_PATH = os.environ.get('TREND_STORE_PATH', 'trend_state.sqlite')
+
+# Serving model (calibrated -> Phase 2 -> Phase 1 fallback), resolved from the registry manifest.
+# Trend features are computed online, so the 43-feature Phase 2 model is servable too once
+# it has been retrained on those features (the registry checks threshold_info).
+registry = ModelRegistry()
+registry.select(FEATURE_NAMES + TREND_FEATURES)
+predictor = registry.predictor()
+serving_info = registry.describe()
+SERVES_TRENDS = set(TREND_FEATURES) <= set(registry.load(registry.serving_phase)['features'])
+print(f"[INFO] Serving {serving_info['label']} ({serving_info['version']})")
+
+# Rows without a patient id have no history to compute trends from; they are scored
+# by the base-feature Phase 1 model instead of a trend model fed zero trends
+history_free_predictor = None
+if SERVES_TRENDS:
+    history_free_predictor = registry.predictor('phase1')
+    print(f"[INFO] Rows without {PATIENT_ID_FIELD} are scored by {history_free_predictor.version}")
+
+# Per-patient trend state (opened lazily in each worker after the fork)
+trend_engine = OnlineTrendFeatures(store=SqliteTrendStore(TREND_STORE_PATH))
+
+# Escalate to high risk when the vital instability score reaches this level
+INSTABILITY_ESCALATION_SCORE = 5
+
+# Clinical rules compiled once for the serving feature order
+rule_engine = ClinicalRuleEngine(FEATURE_NAMES)
 
 @app.route('/')
 def home():
     return render_template('index.html')
 
-def get_abnormal_features(features_dict):
+def build_feature_matrix(payload):
+    """
+    Build an (N, 27) feature matrix from a batch JSON payload
+
+    Accepts either row records:
+        {"patients": [{"HR": 88, "O2Sat": 97, ...}, ...]}  (or a bare list of records)
+    or a columnar payload:
+        {"columns": {"HR": [88, 102, ...], "O2Sat": [97, 91, ...], ...}}
+
+    Missing or non-numeric values become NaN so the clinical rules can skip them;
+    callers fill them with 0 before scoring, matching the form-based /predict.
+    Returns the feature DataFrame (columns in FEATURE_NAMES order).
+    """
+    if isinstance(payload, dict) and 'columns' in payload:
+        columns = payload['columns']
+        if not isinstance(columns, dict):
+            raise ValueError("'columns' must map feature names to lists of values")
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length")
+        n_rows = lengths.pop() if lengths else 0
+        frame = pd.DataFrame({name: columns.get(name, [0] * n_rows) for name in FEATURE_NAMES})
+    else:
+        records = payload.get('patients') if isinstance(payload, dict) else payload
+        if not isinstance(records, list):
+            raise ValueError("Payload must be a list of patient records, {'patients': [...]} or {'columns': {...}}")
+        frame = pd.DataFrame.from_records(records, columns=FEATURE_NAMES)
+
+    return frame.apply(pd.to_numeric, errors='coerce')
+
+def extract_patient_ids(payload):
+    """
+    Patient identifier of each row of a payload accepted by build_feature_matrix
+    (None for rows without one), or None when the payload has no identifiers
+    """
+    if isinstance(payload, dict) and 'columns' in payload:
+        ids = payload['columns'].get(PATIENT_ID_FIELD)
+        return None if ids is None else list(ids)
+    records = payload.get('patients') if isinstance(payload, dict) else payload
+    return [record.get(PATIENT_ID_FIELD) if isinstance(record, dict) else None for record in records]
+
+def has_history(patient_ids, n_rows):
+    """(n_rows,) bool: rows carrying a patient id, whose trend features can be tracked"""
+    if patient_ids is None:
+        return np.zeros(n_rows, dtype=bool)
+    return np.array([patient_id is not None and patient_id != '' for patient_id in patient_ids])
+
+def trend_inputs(frame, patient_ids):
+    """
+    Base plus trend feature matrix for rows that all carry a patient id
+
+    Each row is one new hourly observation of its patient and advances their trend
+    state (in row order).
+    """
+    sources = frame[trend_engine.sources].values
+    trends = np.empty((len(frame), len(TREND_FEATURES)))
+    for i, patient_id in enumerate(patient_ids):
+        trends[i] = trend_engine.update(patient_id, sources[i])
+    return np.hstack((frame.fillna(0).values, trends))
+
+def predict_frame(frame, patient_ids=None):
+    """
+    Model scores for a feature frame
+
+    With the Phase 2 model serving, rows with a patient id get trend features and
+    the trend model; the other rows are scored by the Phase 1 model.
+
+    Returns:
+        dict of (N,) arrays: probability_raw, probability, prediction and
+        history_free (True where the Phase 1 fallback scored the row)
+    """
+    if not SERVES_TRENDS:
+        scores = predictor.predict(frame.fillna(0).values)
+        scores['history_free'] = np.zeros(len(frame), dtype=bool)
+        return scores
+
+    tracked = has_history(patient_ids, len(frame))
+    scores = {
+        'probability_raw': np.empty(len(frame)),
+        'probability': np.empty(len(frame)),
+        'prediction': np.empty(len(frame), dtype=int),
+        'history_free': ~tracked,
+    }
+    if tracked.any():
+        ids = [patient_ids[i] for i in np.flatnonzero(tracked)]
+        part = predictor.predict(trend_inputs(frame[tracked], ids))
+        for key in ('probability_raw', 'probability', 'prediction'):
+            scores[key][tracked] = part[key]
+    if not tracked.all():
+        part = history_free_predictor.predict(frame[~tracked].fillna(0).values)
+        for key in ('probability_raw', 'probability', 'prediction'):
+            scores[key][~tracked] = part[key]
+    return scores
+
+def evaluate_clinical_rules(frame):
+    """
+    Run the clinical rule engine over a feature frame from build_feature_matrix
+    """
+    return rule_engine.evaluate(frame.values)
+
+def scoring_predictor(history_free):
+    """Predictor that scored a row (the Phase 1 fallback for history-free rows)"""
+    return history_free_predictor if history_free else predictor
+
+def score_frame(frame, patient_ids=None):
+    """
+    Score a feature frame with predict_frame and one clinical rule pass
+
+    Returns:
+        dict with the predict_frame outputs (probability_raw, probability, prediction,
+        history_free), the clinical rule results and the instability-adjusted prediction
+    """
+    scores = predict_frame(frame, patient_ids)
+    rules = evaluate_clinical_rules(frame)
+    scores['rules'] = rules
+    scores['adjusted_prediction'] = np.where(
+        rules['severity_score'] >= INSTABILITY_ESCALATION_SCORE, 1, scores['prediction']
+    )
+    return scores
+
+def get_abnormal_features(features_dict, rules=None, row=0):
     """
     Identify which features are outside normal ranges
     """
-    abnormal = []
-    for feature_name, value in features_dict.items():
-        if feature_name in CLINICAL_RANGES and value != '':
-            try:
-                val = float(value)
-                min_val, max_val, unit = CLINICAL_RANGES[feature_name]
-                if val < min_val or val > max_val:
-                    abnormal.append({
-                        'feature': feature_name,
-                        'value': val,
-                        'normal_range': f"{min_val}-{max_val}",
-                        'unit': unit,
-                        'direction': 'HIGH' if val > max_val else 'LOW'
-                    })
-            except:
-                pass
-    
-    # Sort by severity (furthest from normal range)
-    abnormal.sort(key=lambda x: abs(x['value'] - (CLINICAL_RANGES[x['feature']][1] + CLINICAL_RANGES[x['feature']][0]) / 2), reverse=True)
-    return abnormal
+    if rules is None:
+        rules = evaluate_clinical_rules(build_feature_matrix([features_dict]))
+    return rule_engine.abnormal_features(rules, row)
 
-def detect_vital_instability(features_dict):
+def detect_vital_instability(features_dict, rules=None, row=0):
     """
     Detect critical vital sign fluctuations/instability that may indicate sepsis risk
     Even if instantaneous values seem normal, significant variability is a red flag
     """
-    instability_indicators = []
-    severity_score = 0
-    
-    critical_vitals = {
-        'HR': {'normal_range': (60, 100), 'fluctuation_threshold': 20, 'critical_high': 130, 'critical_low': 40},
-        'O2Sat': {'normal_range': (95, 100), 'fluctuation_threshold': 5, 'critical_high': 100, 'critical_low': 85},
-        'Temp': {'normal_range': (36.5, 37.5), 'fluctuation_threshold': 1.5, 'critical_high': 40, 'critical_low': 35},
-        'SBP': {'normal_range': (90, 120), 'fluctuation_threshold': 25, 'critical_high': 180, 'critical_low': 70},
-        'Resp': {'normal_range': (12, 20), 'fluctuation_threshold': 8, 'critical_high': 30, 'critical_low': 8},
-    }
-    
-    for vital, thresholds in critical_vitals.items():
-        try:
-            value = float(features_dict.get(vital, 0))
-            if value == 0:
-                continue
-            
-            min_normal, max_normal = thresholds['normal_range']
-            critical_high = thresholds['critical_high']
-            critical_low = thresholds['critical_low']
-            fluctuation = thresholds['fluctuation_threshold']
-            
-            # Check for critically abnormal values (strong indicator of sepsis)
-            if value >= critical_high or value <= critical_low:
-                instability_indicators.append({
-                    'vital': vital,
-                    'value': value,
-                    'severity': 'CRITICAL',
-                    'description': f'{vital} is critically abnormal ({value:.1f})',
-                    'concern': 'Critical vital sign deviation - immediate attention required'
-                })
-                severity_score += 3
-            
-            # Check for high variability (deviation from normal center point)
-            center_normal = (min_normal + max_normal) / 2
-            deviation_from_normal = abs(value - center_normal)
-            max_acceptable_deviation = (max_normal - min_normal) / 2
-            
-            # If value deviates significantly from normal center, it indicates instability
-            if deviation_from_normal > max_acceptable_deviation + fluctuation:
-                instability_indicators.append({
-                    'vital': vital,
-                    'value': value,
-                    'severity': 'HIGH',
-                    'description': f'{vital} shows significant instability ({value:.1f})',
-                    'concern': 'Notable deviation from normal range'
-                })
-                severity_score += 2
-            
-            # Check for marginal abnormality (approaching danger zones)
-            elif (value > max_normal and value < critical_high) or (value < min_normal and value > critical_low):
-                instability_indicators.append({
-                    'vital': vital,
-                    'value': value,
-                    'severity': 'MODERATE',
-                    'description': f'{vital} is outside normal range ({value:.1f})',
-                    'concern': 'Minor deviation - continued monitoring advised'
-                })
-                severity_score += 1
-        
-        except (ValueError, TypeError):
-            pass
-    
-    return {
-        'indicators': instability_indicators,
-        'severity_score': severity_score,
-        'has_instability': severity_score > 0
-    }
+    if rules is None:
+        rules = evaluate_clinical_rules(build_feature_matrix([features_dict]))
+    return rule_engine.vital_instability(rules, row)
 
-def generate_explanation(features_dict, prediction, confidence):
+def generate_explanation(features_dict, prediction, confidence, rules=None):
     """
     Generate a comprehensive explanation based on abnormal values and vital instability
+    Pass precomputed clinical rule results as `rules` to avoid evaluating them twice
     """
-    abnormal_features = get_abnormal_features(features_dict)
-    vital_instability = detect_vital_instability(features_dict)
+    if rules is None:
+        rules = evaluate_clinical_rules(build_feature_matrix([features_dict]))
+    abnormal_features = get_abnormal_features(features_dict, rules)
+    vital_instability = detect_vital_instability(features_dict, rules)
     
     # Adjust prediction if critical instability is detected
     adjusted_risk_level = prediction
@@ -192,7 +204,7 @@ def generate_explanation(features_dict, prediction, confidence):
     
     # Only escalate prediction if CRITICAL vital issues exist (very high thresholds)
     # Don't override model prediction for mild abnormalities
-    if vital_instability['severity_score'] >= 5:
+    if vital_instability['severity_score'] >= INSTABILITY_ESCALATION_SCORE:
         # Only escalate if extremely critical (e.g., cardiac shock, severe respiratory distress)
         adjusted_risk_level = 1
         adjustment_reason = "⚠️ CRITICAL vital sign abnormalities detected - Risk escalated to HIGH"
@@ -297,60 +309,22 @@ def predict():
     try:
         # Get form data
         form_data = request.form.to_dict()
-        features = []
-        
-        # Convert to float, handle empty values with 0
-        for feature_name in FEATURE_NAMES:
-            try:
-                val = float(form_data.get(feature_name, 0))
-            except:
-                val = 0
-            features.append(val)
-        
-        final_features = np.array(features).reshape(1, -1)
-        
-        # Apply scaler if available (Phase 1 optimization)
-        if scaler is not None:
-            final_features = scaler.transform(final_features)
-        
-        # Make prediction using model
-        prediction = model.predict(final_features)
-        probability = model.predict_proba(final_features)[0]
+        frame = build_feature_matrix([form_data])
         
-        # Get raw sepsis probability
-        prob_sepsis_raw = probability[1]
-        
-        # Apply probability scaling if available (full 0-100% range)
-        if scaling_params is not None:
-            prob_min = scaling_params['prob_min']
-            prob_max = scaling_params['prob_max']
-            # Scale to full [0, 1] range for complete 0-100% spread
-            prob_sepsis = (prob_sepsis_raw - prob_min) / (prob_max - prob_min)
-            prob_sepsis = max(0.0, min(1.0, prob_sepsis))  # Clip to [0, 1]
-        else:
-            prob_sepsis = prob_sepsis_raw
-        
-        # Ensure probability is in valid range [0, 1]
-        prob_sepsis = max(0.0, min(1.0, prob_sepsis))
+        # One forward pass feeds the confidence, the instability adjustment and the explanation
+        scores = score_frame(frame, [form_data.get(PATIENT_ID_FIELD)])
+        rules = scores['rules']
+        prob_sepsis = float(scores['probability'][0])
         prob_no_sepsis = 1 - prob_sepsis
-        
-        # Use 0.5 threshold for binary prediction
-        prediction_tuned = 1 if prob_sepsis >= 0.5 else 0
+        prediction_tuned = int(scores['prediction'][0])
+        adjusted_prediction = int(scores['adjusted_prediction'][0])
         
         # Display confidence for the predicted class
         if prediction_tuned == 1:
             confidence = prob_sepsis * 100
         else:
             confidence = prob_no_sepsis * 100
-        model_version = "Calibrated Logistic Regression"
-        
-        # Get vital instability assessment
-        vital_instability = detect_vital_instability(form_data)
-        
-        # Adjust prediction based on vital instability
-        adjusted_prediction = prediction_tuned
-        if vital_instability['severity_score'] >= 5:
-            adjusted_prediction = 1  # Escalate to high risk only for critical cases
+        model_version = scoring_predictor(scores['history_free'][0]).version
         
         # Determine prediction text
         if adjusted_prediction == 1:
@@ -359,7 +333,7 @@ def predict():
             prediction_text = f"Low Risk of Sepsis ({confidence:.1f}% probability of no sepsis)"
         
         # Generate explanation
-        explanation_html = generate_explanation(form_data, adjusted_prediction, confidence)
+        explanation_html = generate_explanation(form_data, adjusted_prediction, confidence, rules)
         
         return render_template(
             'index.html',
@@ -375,6 +349,70 @@ def predict():
         return render_template('index.html', prediction_text=error_msg)
 
 
+@app.route('/api/model', methods=['GET'])
+def model_info():
+    '''
+    Report which model version is serving and what the registry knows about
+    '''
+    return jsonify({
+        'serving': registry.describe(),
+        'phases': [registry.describe(phase) for phase in registry.serving_order]
+    })
+
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    '''
+    Score many patients in one request and return JSON
+    The whole batch goes through a single scaler.transform and model forward pass
+    (per model, when history-free rows fall back to Phase 1). model_version and
+    threshold describe the serving model; row_model_version and row_threshold give
+    the model and threshold behind each row's prediction.
+    '''
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({'error': 'Request body must be JSON'}), 400
+
+    try:
+        frame = build_feature_matrix(payload)
+        patient_ids = extract_patient_ids(payload)
+        if patient_ids is not None and len(patient_ids) != len(frame):
+            raise ValueError(f"'{PATIENT_ID_FIELD}' must have one value per row")
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    if len(frame) == 0:
+        return jsonify({'count': 0, 'probability_raw': [], 'probability': [],
+                        'prediction': [], 'adjusted_prediction': [], 'history_free': [], 'row_model_version': [], 'row_threshold': [],
+                        'severity_score': [],
+                        'has_instability': [], 'critical_count': [], 'abnormal_count': []})
+
+    try:
+        scores = score_frame(frame, patient_ids)
+        rules = scores['rules']
+        row_predictors = [scoring_predictor(history_free) for history_free in scores['history_free']]
+
+        return jsonify({
+            'count': int(len(frame)),
+            'model_version': predictor.version,
+            'threshold': predictor.threshold,
+            'probability_raw': scores['probability_raw'].tolist(),
+            'probability': scores['probability'].tolist(),
+            'prediction': scores['prediction'].tolist(),
+            'adjusted_prediction': scores['adjusted_prediction'].tolist(),
+            'history_free': scores['history_free'].tolist(),
+            'row_model_version': [p.version for p in row_predictors],
+            'row_threshold': [p.threshold for p in row_predictors],
+            'severity_score': rules['severity_score'].tolist(),
+            'has_instability': rules['has_instability'].tolist(),
+            'critical_count': rules['critical_mask'].sum(axis=1).tolist(),
+            'abnormal_count': rules['abnormal_count'].tolist()
+        })
+
+    except Exception as e:
+        return jsonify({'error': f"Error in batch prediction: {str(e)}"}), 500
+
+
 if __name__ == '__main__':
     app.run(debug=True)
 
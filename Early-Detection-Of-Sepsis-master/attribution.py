@@ -0,0 +1,300 @@
+"""
+Feature Attribution Backends
+Model-specific SHAP-style attributions for the high-risk class, picked by model type
+"""
+
+import numpy as np
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.ensemble import (ExtraTreesClassifier, GradientBoostingClassifier,
+                              RandomForestClassifier)
+from sklearn.linear_model._base import LinearClassifierMixin
+from sklearn.neural_network import MLPClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+TREE_MODELS = (RandomForestClassifier, ExtraTreesClassifier, GradientBoostingClassifier,
+               DecisionTreeClassifier)
+
+# Interpolation steps between the baseline and the instance for integrated gradients;
+# doubled (up to MAX_GRADIENT_STEPS) until the attributions sum to P(x) - P(baseline)
+GRADIENT_STEPS = 32
+MAX_GRADIENT_STEPS = 2048
+COMPLETENESS_TOLERANCE = 0.01
+
+
+def _positive_index(model):
+    classes = list(getattr(model, 'classes_', [0, 1]))
+    return classes.index(1) if 1 in classes else len(classes) - 1
+
+
+def _background_mean(background, weights=None):
+    """(Weighted) mean of the background rows"""
+    return np.average(np.asarray(background, dtype=float), axis=0, weights=weights)
+
+
+def _as_2d(X):
+    X = np.asarray(X, dtype=float)
+    return X.reshape(1, -1) if X.ndim == 1 else X
+
+
+def _positive_class_values(shap_values, positive_index):
+    """Normalize shap's list / (n, features, classes) outputs to (n, features)"""
+    if isinstance(shap_values, list):
+        return np.asarray(shap_values[positive_index])
+    shap_values = np.asarray(shap_values)
+    if shap_values.ndim == 3:
+        return shap_values[..., positive_index]
+    return shap_values
+
+
+class TreeAttribution:
+    """Exact tree-path SHAP (shap.TreeExplainer) for tree ensembles"""
+
+    name = 'tree'
+
+    def __init__(self, model, background=None, weights=None):
+        """
+        Args:
+            model: Fitted tree model, or a CalibratedClassifierCV over one
+            background, weights: Unused; tree SHAP uses the training cover stored in the trees
+        """
+        import shap
+
+        # SHAP values are additive, so the attribution of an averaged calibrated
+        # ensemble is the average of the attributions of its base forests. The
+        # monotone calibration map itself is not attributed.
+        self.estimators = [_base_estimator(c) for c in model.calibrated_classifiers_] \
+            if isinstance(model, CalibratedClassifierCV) else [model]
+        self.explainers = [shap.TreeExplainer(estimator) for estimator in self.estimators]
+        self.positive_index = _positive_index(model)
+
+    def shap_values(self, X):
+        X = _as_2d(X)
+        values = [_positive_class_values(explainer.shap_values(X), self.positive_index)
+                  for explainer in self.explainers]
+        return np.mean(values, axis=0)
+
+
+class LinearAttribution:
+    """
+    Exact SHAP for linear models with independent features, in log-odds units:
+    phi_j = coef_j * (x_j - mean_j) over the background mean
+    """
+
+    name = 'linear'
+
+    def __init__(self, model, background, weights=None):
+        """
+        Args:
+            model: Fitted binary linear classifier (e.g. LogisticRegression)
+            background: (rows, features) reference data
+            weights: Optional (rows,) background weights
+        """
+        coef = np.asarray(model.coef_, dtype=float)
+        # Binary models keep one row of coefficients for classes_[1]
+        self.coef = coef[0] if _positive_index(model) == 1 else -coef[0]
+        self.mean = _background_mean(background, weights)
+
+    def shap_values(self, X):
+        return (_as_2d(X) - self.mean) * self.coef
+
+
+def _activation(name, z):
+    if name == 'relu':
+        return np.maximum(z, 0)
+    if name == 'tanh':
+        return np.tanh(z)
+    if name == 'logistic':
+        return 1.0 / (1.0 + np.exp(-z))
+    return z
+
+
+def _activation_grad(name, z, a):
+    """d activation / dz, from the pre-activation z and activation a"""
+    if name == 'relu':
+        return (z > 0).astype(z.dtype)
+    if name == 'tanh':
+        return 1.0 - a ** 2
+    if name == 'logistic':
+        return a * (1.0 - a)
+    return np.ones_like(z)
+
+
+class MLPGradientAttribution:
+    """
+    Integrated gradients of the high-risk probability for a binary MLPClassifier,
+    computed with a NumPy forward/backward pass over coefs_ and intercepts_
+
+    Attributions are in probability units and sum to P(x) - P(baseline) within
+    COMPLETENESS_TOLERANCE, like KernelExplainer's output.
+    """
+
+    name = 'gradient'
+
+    def __init__(self, model, background, weights=None, steps=GRADIENT_STEPS):
+        """
+        Args:
+            model: Fitted MLPClassifier with a logistic output unit
+            background: (rows, features) reference data; its (weighted) mean is the baseline
+            weights: Optional (rows,) background weights
+            steps: Interpolation steps along the straight path from the baseline
+        """
+        self.coefs = model.coefs_
+        self.intercepts = model.intercepts_
+        self.activation = model.activation
+        self.sign = 1.0 if _positive_index(model) == 1 else -1.0
+        self.baseline = _background_mean(background, weights)
+        self.steps = steps
+
+    def _forward(self, X):
+        pre, post = [], [X]
+        a = X
+        last = len(self.coefs) - 1
+        for i, (W, b) in enumerate(zip(self.coefs, self.intercepts)):
+            z = a @ W + b
+            a = _activation('logistic' if i == last else self.activation, z)
+            pre.append(z)
+            post.append(a)
+        return pre, post
+
+    def probability(self, X):
+        """P(high risk) for an (n, features) matrix"""
+        p = self._forward(X)[1][-1][:, 0]
+        return p if self.sign > 0 else 1.0 - p
+
+    def gradient(self, X):
+        """d P(high risk) / d X for an (n, features) matrix"""
+        pre, post = self._forward(X)
+        last = len(self.coefs) - 1
+        p = post[-1]
+        delta = self.sign * p * (1.0 - p)
+        for i in range(last, -1, -1):
+            if i < last:
+                delta = delta * _activation_grad(self.activation, pre[i], post[i + 1])
+            delta = delta @ self.coefs[i].T
+        return delta
+
+    def _integrate(self, diff, steps):
+        alphas = (np.arange(steps) + 0.5) / steps
+        # (n, steps, features) path points, evaluated in one batched pass
+        path = self.baseline + alphas[None, :, None] * diff[:, None, :]
+        grads = self.gradient(path.reshape(-1, diff.shape[1])).reshape(path.shape)
+        return diff * grads.mean(axis=1)
+
+    def shap_values(self, X):
+        X = _as_2d(X)
+        diff = X - self.baseline
+        target = self.probability(X) - self.probability(self.baseline[None])
+        values = self._integrate(diff, self.steps)
+        steps = self.steps
+        # Refine only the rows whose path is too steep for the current step count
+        todo = np.abs(values.sum(axis=1) - target) > COMPLETENESS_TOLERANCE
+        while todo.any() and steps < MAX_GRADIENT_STEPS:
+            steps *= 2
+            values[todo] = self._integrate(diff[todo], steps)
+            todo[todo] = np.abs(values[todo].sum(axis=1) - target[todo]) > COMPLETENESS_TOLERANCE
+        return values
+
+
+class KerasGradientAttribution:
+    """
+    Integrated gradients for a Keras model with a single sigmoid output
+    (e.g. the Phase 3 LSTM); attributions have the shape of the input
+    """
+
+    name = 'gradient'
+
+    def __init__(self, model, background, weights=None, steps=GRADIENT_STEPS):
+        """
+        Args:
+            model: Keras model mapping (n, ...) inputs to (n, 1) probabilities
+            background: (rows, ...) reference inputs; their (weighted) mean is the baseline
+            weights: Optional (rows,) background weights
+            steps: Interpolation steps along the straight path from the baseline
+        """
+        import tensorflow as tf
+
+        self.tf = tf
+        self.model = model
+        self.baseline = _background_mean(background, weights).astype(np.float32)
+        self.alphas = ((np.arange(steps) + 0.5) / steps).astype(np.float32)
+
+    def shap_values(self, X):
+        tf = self.tf
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == self.baseline.ndim:
+            X = X[None]
+        diff = X - self.baseline
+        alphas = self.alphas.reshape((1, -1) + (1,) * self.baseline.ndim)
+        path = self.baseline + alphas * diff[:, None]
+        flat = tf.convert_to_tensor(path.reshape((-1,) + self.baseline.shape))
+        with tf.GradientTape() as tape:
+            tape.watch(flat)
+            prob = self.model(flat, training=False)[:, -1]
+        grads = tape.gradient(prob, flat).numpy().reshape(path.shape)
+        return diff * grads.mean(axis=1)
+
+
+class KernelAttribution:
+    """Model-agnostic fallback: shap.KernelExplainer over predict_proba"""
+
+    name = 'kernel'
+
+    def __init__(self, model, background, weights=None):
+        import shap
+
+        if weights is not None:
+            background = _dense_data(background, weights)
+        self.explainer = shap.KernelExplainer(model.predict_proba, background)
+        self.positive_index = _positive_index(model)
+
+    def shap_values(self, X):
+        return _positive_class_values(self.explainer.shap_values(_as_2d(X)), self.positive_index)
+
+
+def _dense_data(background, weights):
+    """Weighted background in the form KernelExplainer accepts (as from shap.kmeans)"""
+    try:
+        from shap.utils._legacy import DenseData
+    except ImportError:  # older shap releases
+        from shap.common import DenseData
+    background = np.asarray(background, dtype=float)
+    names = [str(i) for i in range(background.shape[1])]
+    return DenseData(background, names, None, np.asarray(weights, dtype=float))
+
+
+def _base_estimator(calibrated_classifier):
+    # sklearn >= 1.2 renamed base_estimator to estimator
+    return getattr(calibrated_classifier, 'estimator', None) or calibrated_classifier.base_estimator
+
+
+def _is_keras(model):
+    return type(model).__module__.split('.')[0] in ('keras', 'tensorflow', 'tf_keras')
+
+
+def make_attribution(model, background, weights=None):
+    """
+    Pick the fastest exact (or gradient-based) attribution backend for a model
+
+    Args:
+        model: Fitted classifier
+        background: (rows, features) reference data
+        weights: Optional (rows,) background weights (e.g. k-means cluster sizes)
+
+    Returns:
+        Backend exposing shap_values(X) -> (n, features) high-risk attributions
+        and a `name` ('tree', 'linear', 'gradient' or 'kernel')
+    """
+    base = model
+    if isinstance(model, CalibratedClassifierCV) and getattr(model, 'calibrated_classifiers_', None):
+        base = _base_estimator(model.calibrated_classifiers_[0])
+
+    if isinstance(base, TREE_MODELS):
+        return TreeAttribution(model)
+    if _is_keras(model):
+        return KerasGradientAttribution(model, background, weights)
+    if base is model and len(getattr(model, 'classes_', [])) == 2:
+        if isinstance(model, LinearClassifierMixin) and hasattr(model, 'predict_proba'):
+            return LinearAttribution(model, background, weights)
+        if isinstance(model, MLPClassifier) and model.out_activation_ == 'logistic':
+            return MLPGradientAttribution(model, background, weights)
+    return KernelAttribution(model, background, weights)
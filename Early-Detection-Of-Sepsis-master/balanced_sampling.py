@@ -0,0 +1,100 @@
+"""
+Balanced Sampling
+Class balancing by index arrays over the cached feature matrix, without copying rows
+"""
+
+import numpy as np
+from sklearn.utils import check_random_state
+
+
+class BalancedSampler:
+    """Upsamples the minority class by drawing row indices instead of DataFrame rows"""
+
+    def __init__(self, labels, n_samples=None, random_state=123):
+        """
+        Args:
+            labels: (rows,) binary label array (0 = majority, 1 = minority)
+            n_samples: Minority rows to draw with replacement (default: majority size)
+            random_state: Seed, as passed to sklearn.utils.resample
+        """
+        labels = np.asarray(labels)
+        self.majority = np.flatnonzero(labels == 0)
+        self.minority = np.flatnonzero(labels == 1)
+        self.n_samples = len(self.majority) if n_samples is None else n_samples
+        self.random_state = random_state
+
+    def indices(self):
+        """
+        Row indices of the balanced dataset: all majority rows, then the upsampled
+        minority rows. Same rows and order as resample() + pd.concat() used to give.
+        """
+        rng = check_random_state(self.random_state)
+        drawn = rng.randint(0, len(self.minority), size=self.n_samples)
+        return np.concatenate((self.majority, self.minority[drawn]))
+
+    def __len__(self):
+        return len(self.majority) + self.n_samples
+
+    def minibatches(self, batch_size=256, index=None, shuffle=True, seed=None):
+        """
+        Yield index arrays of one epoch over the balanced rows
+
+        Args:
+            batch_size: Rows per minibatch
+            index: Optional subset of balanced indices (e.g. the training split)
+            shuffle: Visit the rows in random order
+            seed: Shuffle seed
+        """
+        index = self.indices() if index is None else np.asarray(index)
+        if shuffle:
+            index = np.random.default_rng(seed).permutation(index)
+        for start in range(0, len(index), batch_size):
+            yield index[start:start + batch_size]
+
+
+def gather_rows(columns, index):
+    """
+    Gather rows from per-column (typically memory-mapped) arrays into one matrix
+
+    Only the requested rows are read, so the full matrix never has to fit in memory.
+    """
+    index = np.asarray(index)
+    out = np.empty((len(index), len(columns)), dtype=np.float64)
+    for j, column in enumerate(columns):
+        out[:, j] = column[index]
+    return out
+
+
+def partial_fit_balanced(model, columns, labels, sampler, index, epochs=1, batch_size=256,
+                         scaler=None, classes=(0, 1), seed=0, fit_scaler=True):
+    """
+    Train an estimator with partial_fit on balanced minibatches streamed from disk
+
+    Args:
+        model: Estimator exposing partial_fit (e.g. MLPClassifier with adam/sgd)
+        columns: Per-column feature arrays (memory-mapped cache columns)
+        labels: (rows,) label array
+        sampler: BalancedSampler over labels
+        index: Balanced row indices to train on (e.g. the training split)
+        epochs: Passes over index
+        batch_size: Rows per partial_fit call
+        scaler: Optional scaler, updated incrementally in a first pass and applied to every batch
+        classes: All class labels (required by the first partial_fit call)
+        seed: Base shuffle seed (epoch e uses seed + e)
+        fit_scaler: False applies an already fitted scaler without updating it
+    """
+    # partial_fit drives its own epochs; MLP early stopping only applies to fit()
+    if getattr(model, 'early_stopping', False):
+        model.set_params(early_stopping=False)
+
+    if scaler is not None and fit_scaler:
+        for batch in sampler.minibatches(batch_size * 16, index, shuffle=False):
+            scaler.partial_fit(gather_rows(columns, np.sort(batch)))
+
+    for epoch in range(epochs):
+        for batch in sampler.minibatches(batch_size, index, shuffle=True, seed=seed + epoch):
+            X_batch = gather_rows(columns, batch)
+            if scaler is not None:
+                X_batch = scaler.transform(X_batch)
+            model.partial_fit(X_batch, labels[batch], classes=np.asarray(classes))
+    return model
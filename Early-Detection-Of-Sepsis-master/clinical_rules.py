@@ -0,0 +1,195 @@
+"""
+Clinical Rule Engine
+Table-driven evaluation of clinical reference ranges and critical vital thresholds
+"""
+
+import numpy as np
+
+# Clinical reference ranges for warning indicators
+CLINICAL_RANGES = {
+    'HR': (60, 100, 'beats/min'),
+    'O2Sat': (95, 100, '%'),
+    'Temp': (36.5, 37.5, '°C'),
+    'SBP': (90, 120, 'mm Hg'),
+    'MAP': (70, 100, 'mm Hg'),
+    'DBP': (60, 80, 'mm Hg'),
+    'Resp': (12, 20, 'breaths/min'),
+    'Lactate': (0.5, 2.0, 'mmol/L'),
+    'Glucose': (70, 100, 'mg/dL'),
+    'Creatinine': (0.7, 1.3, 'mg/dL'),
+    'WBC': (4.5, 11, 'K/µL'),
+    'Hgb': (13.5, 17.5, 'g/dL'),
+}
+
+# Vital sign thresholds used for instability detection
+CRITICAL_VITALS = {
+    'HR': {'normal_range': (60, 100), 'fluctuation_threshold': 20, 'critical_high': 130, 'critical_low': 40},
+    'O2Sat': {'normal_range': (95, 100), 'fluctuation_threshold': 5, 'critical_high': 100, 'critical_low': 85},
+    'Temp': {'normal_range': (36.5, 37.5), 'fluctuation_threshold': 1.5, 'critical_high': 40, 'critical_low': 35},
+    'SBP': {'normal_range': (90, 120), 'fluctuation_threshold': 25, 'critical_high': 180, 'critical_low': 70},
+    'Resp': {'normal_range': (12, 20), 'fluctuation_threshold': 8, 'critical_high': 30, 'critical_low': 8},
+}
+
+# Severity points added to the instability score per rule
+CRITICAL_POINTS = 3
+HIGH_POINTS = 2
+MODERATE_POINTS = 1
+
+
+class ClinicalRuleEngine:
+    """Evaluates clinical rules over a whole (N, features) matrix in one pass"""
+
+    def __init__(self, feature_names, clinical_ranges=CLINICAL_RANGES, critical_vitals=CRITICAL_VITALS):
+        """
+        Compile the rule tables into NumPy threshold arrays
+
+        Args:
+            feature_names: Column order of the matrices passed to evaluate()
+            clinical_ranges: {feature: (min, max, unit)} reference ranges
+            critical_vitals: {vital: thresholds} instability thresholds
+        """
+        self.feature_names = list(feature_names)
+        column = {name: i for i, name in enumerate(self.feature_names)}
+
+        # Reference ranges, in feature column order
+        self.range_features = [name for name in self.feature_names if name in clinical_ranges]
+        self.range_specs = [clinical_ranges[name] for name in self.range_features]
+        self.range_index = np.array([column[name] for name in self.range_features], dtype=int)
+        self.range_low = np.array([spec[0] for spec in self.range_specs], dtype=float)
+        self.range_high = np.array([spec[1] for spec in self.range_specs], dtype=float)
+        self.range_center = (self.range_low + self.range_high) / 2
+
+        # Vital instability thresholds, in critical_vitals order
+        self.vital_features = [name for name in critical_vitals if name in column]
+        thresholds = [critical_vitals[name] for name in self.vital_features]
+        self.vital_index = np.array([column[name] for name in self.vital_features], dtype=int)
+        self.normal_low = np.array([t['normal_range'][0] for t in thresholds], dtype=float)
+        self.normal_high = np.array([t['normal_range'][1] for t in thresholds], dtype=float)
+        self.critical_low = np.array([t['critical_low'] for t in thresholds], dtype=float)
+        self.critical_high = np.array([t['critical_high'] for t in thresholds], dtype=float)
+        self.fluctuation = np.array([t['fluctuation_threshold'] for t in thresholds], dtype=float)
+        self.normal_center = (self.normal_low + self.normal_high) / 2
+        self.normal_half_width = (self.normal_high - self.normal_low) / 2
+
+    def evaluate(self, X):
+        """
+        Evaluate all rules for every row of X
+
+        Args:
+            X: (N, features) array in feature_names order; NaN marks a missing value
+
+        Returns:
+            dict of arrays:
+                abnormal_mask / low_mask / high_mask: (N, R) reference-range flags
+                deviation: (N, R) distance from the normal-range center (-inf when normal)
+                abnormal_rank: (N, R) range columns ordered by decreasing deviation
+                abnormal_count: (N,) number of abnormal values per row
+                critical_mask / high_instability_mask / moderate_mask: (N, V) vital flags
+                severity_score: (N,) instability score per row
+                has_instability: (N,) severity_score > 0
+        """
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        # Reference-range rules (missing values are never abnormal)
+        values = X[:, self.range_index]
+        with np.errstate(invalid='ignore'):
+            low_mask = values < self.range_low
+            high_mask = values > self.range_high
+        abnormal_mask = low_mask | high_mask
+        deviation = np.where(abnormal_mask, np.abs(values - self.range_center), -np.inf)
+        abnormal_rank = np.argsort(-deviation, axis=1, kind='stable')
+
+        # Vital instability rules (0 is treated as "not measured")
+        vitals = X[:, self.vital_index]
+        measured = ~np.isnan(vitals) & (vitals != 0)
+        with np.errstate(invalid='ignore'):
+            critical_mask = measured & ((vitals >= self.critical_high) | (vitals <= self.critical_low))
+            high_instability_mask = measured & (
+                np.abs(vitals - self.normal_center) > self.normal_half_width + self.fluctuation
+            )
+            marginal = ((vitals > self.normal_high) & (vitals < self.critical_high)) | \
+                       ((vitals < self.normal_low) & (vitals > self.critical_low))
+        moderate_mask = measured & ~high_instability_mask & marginal
+
+        severity_score = (CRITICAL_POINTS * critical_mask.sum(axis=1)
+                          + HIGH_POINTS * high_instability_mask.sum(axis=1)
+                          + MODERATE_POINTS * moderate_mask.sum(axis=1))
+
+        return {
+            'vitals': vitals,
+            'values': values,
+            'abnormal_mask': abnormal_mask,
+            'low_mask': low_mask,
+            'high_mask': high_mask,
+            'deviation': deviation,
+            'abnormal_rank': abnormal_rank,
+            'abnormal_count': abnormal_mask.sum(axis=1),
+            'critical_mask': critical_mask,
+            'high_instability_mask': high_instability_mask,
+            'moderate_mask': moderate_mask,
+            'severity_score': severity_score,
+            'has_instability': severity_score > 0,
+        }
+
+    def abnormal_features(self, result, row=0):
+        """
+        List the abnormal values of one evaluated row, most severe first
+
+        Returns:
+            list of dicts with feature, value, normal_range, unit and direction
+        """
+        abnormal = []
+        for j in result['abnormal_rank'][row][:result['abnormal_count'][row]]:
+            min_val, max_val, unit = self.range_specs[j]
+            abnormal.append({
+                'feature': self.range_features[j],
+                'value': float(result['values'][row, j]),
+                'normal_range': f"{min_val}-{max_val}",
+                'unit': unit,
+                'direction': 'HIGH' if result['high_mask'][row, j] else 'LOW'
+            })
+        return abnormal
+
+    def vital_instability(self, result, row=0):
+        """
+        Describe the vital instability findings of one evaluated row
+
+        Returns:
+            dict with indicators, severity_score and has_instability
+        """
+        indicators = []
+        for j, vital in enumerate(self.vital_features):
+            value = float(result['vitals'][row, j])
+            if result['critical_mask'][row, j]:
+                indicators.append({
+                    'vital': vital,
+                    'value': value,
+                    'severity': 'CRITICAL',
+                    'description': f'{vital} is critically abnormal ({value:.1f})',
+                    'concern': 'Critical vital sign deviation - immediate attention required'
+                })
+            if result['high_instability_mask'][row, j]:
+                indicators.append({
+                    'vital': vital,
+                    'value': value,
+                    'severity': 'HIGH',
+                    'description': f'{vital} shows significant instability ({value:.1f})',
+                    'concern': 'Notable deviation from normal range'
+                })
+            elif result['moderate_mask'][row, j]:
+                indicators.append({
+                    'vital': vital,
+                    'value': value,
+                    'severity': 'MODERATE',
+                    'description': f'{vital} is outside normal range ({value:.1f})',
+                    'concern': 'Minor deviation - continued monitoring advised'
+                })
+
+        severity_score = int(result['severity_score'][row])
+        return {
+            'indicators': indicators,
+            'severity_score': severity_score,
+            'has_instability': severity_score > 0
+        }
@@ -0,0 +1,229 @@
+"""
+Cross-Validation and Threshold Search
+Stratified k-fold folds fitted in parallel with cached out-of-fold predictions, and a
+decision threshold picked in one pass over the sorted scores
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from balanced_sampling import BalancedSampler
+
+CV_CACHE_DIR = '.cv_cache'
+N_SPLITS = 5
+THRESHOLD_METRICS = ('youden', 'f1')
+
+# Seed of the minority upsampling inside each training fold
+UPSAMPLE_SEED = 123
+
+# (model, X, y, folds, upsample) inherited by forked fold workers instead of pickled per task
+_CV_DATA = None
+
+
+def fold_key(model, X, y, n_splits, random_state, fold, upsample=False):
+    """Cache key of one fold: hash of the data, the model parameters, the split and the upsampling"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    params = {name: repr(value) for name, value in model.get_params().items()}
+    digest.update(json.dumps([type(model).__name__, params, n_splits, random_state, fold,
+                              upsample], sort_keys=True).encode())
+    return digest.hexdigest()[:24]
+
+
+def _fit_fold(fold):
+    model, X, y, folds, upsample = _CV_DATA
+    train_idx, test_idx = folds[fold]
+    if upsample:
+        # Duplicates of minority rows are drawn from this fold's training rows only,
+        # so no copy of a held-out row is ever fitted
+        train_idx = train_idx[BalancedSampler(y[train_idx], random_state=UPSAMPLE_SEED).indices()]
+    start = time.perf_counter()
+    fitted = clone(model).fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - start
+    positive = list(fitted.classes_).index(1)
+    return fold, fitted.predict_proba(X[test_idx])[:, positive], fit_seconds
+
+
+def cross_val_predictions(model, X, y, n_splits=N_SPLITS, random_state=0, n_jobs=None,
+                          cache_dir=CV_CACHE_DIR, upsample=False):
+    """
+    Out-of-fold probabilities from stratified k-fold cross-validation
+
+    Folds missing from the cache are fitted in parallel, one forked worker per fold
+    (the data is inherited, not pickled). Every fold's predictions are saved under
+    a key of the data, model parameters and split, so rerunning with the same
+    inputs (e.g. to try another threshold metric) fits nothing.
+
+    Args:
+        model: Unfitted classifier exposing predict_proba (cloned per fold)
+        X, y: Training data; y holds 0/1 labels
+        n_splits: Folds
+        random_state: Shuffle seed of the stratified split
+        n_jobs: Worker processes (default: CPU count; 1 runs in this process)
+        cache_dir: Directory for cached fold predictions (None disables caching)
+        upsample: Upsample the minority class within each training fold (BalancedSampler);
+            X, y must then be the original rows, and predictions are on the original
+            held-out rows
+
+    Returns:
+        dict: proba (n,) out-of-fold probability, fold (n,) fold of each row,
+        fit_seconds per fold (0 for cached folds) and cached (number of cached folds)
+    """
+    global _CV_DATA
+    X, y = np.asarray(X), np.asarray(y)
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    folds = list(splitter.split(X, y))
+
+    proba = np.empty(len(y), dtype=np.float64)
+    fold_of = np.empty(len(y), dtype=np.int64)
+    fit_seconds = [0.0] * n_splits
+    pending = []
+    for k, (_, test_idx) in enumerate(folds):
+        fold_of[test_idx] = k
+        path = None
+        if cache_dir:
+            path = os.path.join(cache_dir, f"{fold_key(model, X, y, n_splits, random_state, k, upsample)}.npy")
+        if path and os.path.exists(path):
+            proba[test_idx] = np.load(path)
+        else:
+            pending.append((k, path))
+
+    if pending:
+        _CV_DATA = (model, X, y, folds, upsample)
+        try:
+            n_jobs = min(n_jobs or os.cpu_count() or 1, len(pending))
+            if n_jobs > 1 and 'fork' in multiprocessing.get_all_start_methods():
+                with multiprocessing.get_context('fork').Pool(n_jobs) as pool:
+                    results = pool.map(_fit_fold, [k for k, _ in pending], chunksize=1)
+            else:
+                results = [_fit_fold(k) for k, _ in pending]
+        finally:
+            _CV_DATA = None
+
+        paths = dict(pending)
+        for k, fold_proba, seconds in results:
+            proba[folds[k][1]] = fold_proba
+            fit_seconds[k] = seconds
+            if paths[k]:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp = paths[k] + '.tmp.npy'
+                np.save(tmp, fold_proba)
+                os.replace(tmp, paths[k])
+
+    return {
+        'proba': proba,
+        'fold': fold_of,
+        'fit_seconds': fit_seconds,
+        'cached': n_splits - len(pending),
+    }
+
+
+def classification_counts(y, proba, threshold=0.5):
+    """(tn, fp, fn, tp) at a threshold"""
+    y = np.asarray(y).astype(bool)
+    predicted = np.asarray(proba) >= threshold
+    tp = int(np.sum(predicted & y))
+    fp = int(np.sum(predicted & ~y))
+    fn = int(np.sum(~predicted & y))
+    return len(y) - tp - fp - fn, fp, fn, tp
+
+
+def threshold_metrics(y, proba, threshold=0.5):
+    """
+    Accuracy, precision, recall, specificity, F1 and ROC-AUC at one threshold
+
+    Returns:
+        dict of floats (ROC-AUC is NaN when y has a single class)
+    """
+    tn, fp, fn, tp = classification_counts(y, proba, threshold)
+    total = tn + fp + fn + tp
+    both_classes = 0 < tp + fn < total
+    return {
+        'accuracy': (tp + tn) / total if total else 0.0,
+        'precision': tp / (tp + fp) if tp + fp else 0.0,
+        'recall': tp / (tp + fn) if tp + fn else 0.0,
+        'specificity': tn / (tn + fp) if tn + fp else 0.0,
+        'f1': 2 * tp / (2 * tp + fp + fn) if tp else 0.0,
+        'roc_auc': float(roc_auc_score(y, proba)) if both_classes else float('nan'),
+    }
+
+
+def fold_metrics(y, proba, fold, threshold=0.5):
+    """
+    Per-fold metrics from out-of-fold predictions
+
+    Returns:
+        {metric: (n_splits,) array}
+    """
+    per_fold = [threshold_metrics(y[fold == k], proba[fold == k], threshold)
+                for k in np.unique(fold)]
+    return {name: np.array([m[name] for m in per_fold]) for name in per_fold[0]}
+
+
+def threshold_sweep(y, scores):
+    """
+    Confusion counts at every distinct score used as the threshold, in one pass
+
+    Sorting the scores once (descending) turns "predict positive when score >= t"
+    into a prefix of the sorted rows, so cumulative sums give the true/false
+    positives for every candidate threshold without re-scoring.
+
+    Returns:
+        dict of arrays ordered by decreasing threshold: thresholds, tp, fp, fn, tn
+    """
+    y = np.asarray(y).astype(bool)
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind='stable')
+    sorted_scores, sorted_y = scores[order], y[order]
+    tp = np.cumsum(sorted_y)
+    fp = np.cumsum(~sorted_y)
+    # Rows with equal scores are classified together: keep the last row of each run
+    last = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(scores) - 1]
+    tp, fp = tp[last], fp[last]
+    positives, negatives = int(y.sum()), int(len(y) - y.sum())
+    return {
+        'thresholds': sorted_scores[last],
+        'tp': tp,
+        'fp': fp,
+        'fn': positives - tp,
+        'tn': negatives - fp,
+    }
+
+
+def optimal_threshold(y, scores, metric='youden'):
+    """
+    Threshold maximizing Youden's J (sensitivity + specificity - 1) or F1
+
+    Returns:
+        dict: threshold, metric, score, sensitivity, specificity, precision
+    """
+    if metric not in THRESHOLD_METRICS:
+        raise ValueError(f"Unknown threshold metric: {metric}")
+    sweep = threshold_sweep(y, scores)
+    tp, fp, fn, tn = sweep['tp'], sweep['fp'], sweep['fn'], sweep['tn']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sensitivity = np.nan_to_num(tp / (tp + fn))
+        specificity = np.nan_to_num(tn / (tn + fp))
+        precision = np.nan_to_num(tp / (tp + fp))
+        if metric == 'youden':
+            objective = sensitivity + specificity - 1
+        else:
+            objective = np.nan_to_num(2 * tp / (2 * tp + fp + fn))
+    best = int(np.argmax(objective))
+    return {
+        'threshold': float(sweep['thresholds'][best]),
+        'metric': metric,
+        'score': float(objective[best]),
+        'sensitivity': float(sensitivity[best]),
+        'specificity': float(specificity[best]),
+        'precision': float(precision[best]),
+    }
@@ -0,0 +1,193 @@
+"""
+Columnar Dataset Cache
+Parses sepsis.csv once into typed per-column .npy files, keyed by the source file's hash
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SOURCE = 'sepsis.csv'
+CACHE_DIR = '.data_cache'
+LABEL_COLUMN = 'SepsisLabel'
+MANIFEST_NAME = 'manifest.json'
+
+
+def file_sha256(path):
+    """Content hash of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _column_dtype(name, series):
+    """Explicit on-disk dtype: int8 labels, float32 numeric features, unicode otherwise"""
+    if name == LABEL_COLUMN:
+        return np.int8
+    if pd.api.types.is_numeric_dtype(series):
+        return np.float32
+    return str
+
+
+class DatasetCache:
+    """Typed columnar cache of one CSV file"""
+
+    def __init__(self, source=DEFAULT_SOURCE, cache_dir=None):
+        """
+        Args:
+            source: Path to the CSV file
+            cache_dir: Directory holding the per-source cache folders
+                (default: CACHE_DIR next to the source file)
+        """
+        self.source = source
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(source), CACHE_DIR)
+        self._manifest = None
+        self._path = None
+
+    def _stem(self):
+        return os.path.splitext(os.path.basename(self.source))[0]
+
+    def _read_manifest(self, folder):
+        try:
+            with open(os.path.join(folder, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _candidates(self):
+        # Only '<stem>-<16 hex chars>' folders belong to this source; a bare prefix
+        # match would also claim (and on rebuild delete) e.g. sepsis-extra's caches
+        if not os.path.isdir(self.cache_dir):
+            return []
+        pattern = re.compile(re.escape(self._stem()) + r'-[0-9a-f]{16}')
+        return [os.path.join(self.cache_dir, name) for name in sorted(os.listdir(self.cache_dir))
+                if pattern.fullmatch(name)]
+
+    def ensure(self):
+        """
+        Return the cache folder for the current source contents, building it if needed
+
+        An unchanged size and mtime reuse the recorded hash; otherwise the source is
+        re-hashed, and a new hash triggers a rebuild (older caches are removed).
+        """
+        if self._path is not None:
+            return self._path
+
+        stat = os.stat(self.source)
+        for folder in self._candidates():
+            manifest = self._read_manifest(folder)
+            if manifest and manifest['source_size'] == stat.st_size and manifest['source_mtime'] == stat.st_mtime:
+                self._manifest, self._path = manifest, folder
+                return folder
+
+        sha = file_sha256(self.source)
+        folder = os.path.join(self.cache_dir, f"{self._stem()}-{sha[:16]}")
+        manifest = self._read_manifest(folder)
+        if manifest is None:
+            for stale in self._candidates():
+                shutil.rmtree(stale, ignore_errors=True)
+            manifest = self._build(folder, sha)
+        manifest.update(source_size=stat.st_size, source_mtime=stat.st_mtime)
+        self._write_manifest(folder, manifest)
+
+        self._manifest, self._path = manifest, folder
+        return folder
+
+    def _write_manifest(self, folder, manifest):
+        tmp = os.path.join(folder, MANIFEST_NAME + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, os.path.join(folder, MANIFEST_NAME))
+
+    def _build(self, folder, sha):
+        print(f"[INFO] Building columnar cache for {self.source}...")
+        df = pd.read_csv(self.source)
+        tmp_folder = folder + '.building'
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        os.makedirs(tmp_folder)
+
+        dtypes = {}
+        for i, name in enumerate(df.columns):
+            values = np.asarray(df[name].to_numpy(), dtype=_column_dtype(name, df[name]))
+            np.save(os.path.join(tmp_folder, f"{i:03d}.npy"), values)
+            dtypes[name] = values.dtype.str
+
+        os.replace(tmp_folder, folder)
+        return {
+            'source': self.source,
+            'source_sha256': sha,
+            'n_rows': int(len(df)),
+            'columns': list(df.columns),
+            'dtypes': dtypes,
+        }
+
+    @property
+    def sha256(self):
+        """Content hash of the source file the cache was built from"""
+        self.ensure()
+        return self._manifest['source_sha256']
+
+    @property
+    def columns(self):
+        """Column names in source order"""
+        self.ensure()
+        return list(self._manifest['columns'])
+
+    def column(self, name, mmap=True):
+        """One column as a (memory-mapped by default) NumPy array"""
+        folder = self.ensure()
+        i = self._manifest['columns'].index(name)
+        return np.load(os.path.join(folder, f"{i:03d}.npy"), mmap_mode='r' if mmap else None)
+
+    def matrix(self, columns, dtype=np.float32):
+        """Stack the requested columns into one (rows, len(columns)) array"""
+        out = np.empty((self._n_rows(), len(columns)), dtype=dtype)
+        for j, name in enumerate(columns):
+            out[:, j] = self.column(name)
+        return out
+
+    def _n_rows(self):
+        self.ensure()
+        return self._manifest['n_rows']
+
+    def frame(self, columns=None):
+        """
+        DataFrame of the requested columns (all columns when None)
+
+        The frame holds its own copy of the data; use column() for memory-mapped access.
+
+        Raises:
+            KeyError: a requested column is not in the dataset
+        """
+        available = self.columns
+        columns = available if columns is None else list(columns)
+        missing = [name for name in columns if name not in available]
+        if missing:
+            raise KeyError(f"Columns not in {self.source}: {missing}")
+        return pd.DataFrame({name: self.column(name) for name in columns})
+
+
+def load_dataset(path=DEFAULT_SOURCE, columns=None):
+    """
+    Drop-in replacement for pd.read_csv(path) backed by the columnar cache
+
+    Args:
+        path: CSV file
+        columns: Optional column projection (only these columns are read)
+
+    Returns:
+        pandas DataFrame
+    """
+    return DatasetCache(path).frame(columns)
+
+
+def dataset_columns(path=DEFAULT_SOURCE):
+    """Column names of a dataset, without loading any data"""
+    return DatasetCache(path).columns
@@ -4,35 +4,133 @@ Provides interpretability for sepsis prediction model
 """
 
 import numpy as np
-import pandas as pd
 import pickle
 import json
-import base64
-import io
-from io import BytesIO
+import copy
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import matplotlib
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import seaborn as sns
-import shap
 import lime
 import lime.lime_tabular
 from sklearn.neural_network import MLPClassifier
 
+from attribution import make_attribution
+from data_cache import file_sha256, load_dataset
+from explainer_artifacts import (background_path, lime_stats_path, load_artifact,
+                                 summarize_background)
+from explanation_cache import ExplanationCache, LimeResult, explanation_key, quantization_steps
+from plot_rendering import PlotRenderer
+
+
+# Instances per explain_batch task
+BATCH_CHUNK_SIZE = 32
+# Seed of the LIME sampling for every explained instance
+LIME_SEED = 0
+
+# Explainer inherited by forked explain_batch workers
+_POOL_EXPLAINER = None
+
+
+def _explain_chunk_task(task):
+    return _POOL_EXPLAINER._explain_chunk(*task)
+
+
+def _seeded_lime(explainer, seed=LIME_SEED):
+    """
+    Shallow copy of a LimeTabularExplainer with its own RandomState
+
+    The explainer, its ridge fitter and its discretizer normally share one
+    RandomState, so concurrent explain_instance calls would draw from the same
+    stream in whatever order the threads run. Each copy starts from seed, which
+    makes an instance's explanation independent of what else is explained
+    (threaded or serial) and reproducible.
+    """
+    random_state = np.random.RandomState(seed)
+    explainer = copy.copy(explainer)
+    explainer.random_state = random_state
+    explainer.base = copy.copy(explainer.base)
+    explainer.base.random_state = random_state
+    if explainer.discretizer is not None:
+        explainer.discretizer = copy.copy(explainer.discretizer)
+        explainer.discretizer.random_state = random_state
+    return explainer
+
+
+class _PredictionBatcher:
+    """
+    predict_fn shared by several threads that each call it once: blocks until every
+    live thread has submitted its rows, then answers all of them with one call
+
+    Invariant: each caller calls the batcher at most once and then done().
+    LimeTabularExplainer.explain_instance makes exactly one predict_fn call, which
+    is what the batch LIME path relies on. A second call from the same thread would
+    wait for a flush that needs every other live thread to submit again, and block
+    forever.
+    """
+
+    def __init__(self, predict_fn, n_callers):
+        self.predict_fn = predict_fn
+        self.pending = n_callers  # threads that may still submit
+        self.requests = []
+        self.condition = threading.Condition()
+
+    def __call__(self, X):
+        request = {'X': np.asarray(X)}
+        with self.condition:
+            self.requests.append(request)
+            self._flush_if_ready()
+            while 'y' not in request and 'error' not in request:
+                self.condition.wait()
+        if 'error' in request:
+            raise request['error']
+        return request['y']
+
+    def done(self):
+        """Called by each thread when it will not submit (again)"""
+        with self.condition:
+            self.pending -= 1
+            self._flush_if_ready()
+
+    def _flush_if_ready(self):
+        if not self.requests or len(self.requests) < self.pending:
+            return
+        requests, self.requests = self.requests, []
+        try:
+            y = self.predict_fn(np.concatenate([r['X'] for r in requests]))
+            offsets = np.cumsum([len(r['X']) for r in requests])[:-1]
+            for request, part in zip(requests, np.split(y, offsets)):
+                request['y'] = part
+        except Exception as e:
+            for request in requests:
+                request['error'] = e
+        self.condition.notify_all()
+
 
 class ModelExplainer:
     """Wrapper class for model explainability using SHAP and LIME"""
     
-    def __init__(self, model_path='model.pkl', data_path='sepsis.csv'):
+    def __init__(self, model_path='model.pkl', data_path='sepsis.csv', cache=None, renderer=None):
         """
         Initialize the explainer with model and training data
         
         Args:
             model_path: Path to the trained model pickle file
             data_path: Path to the training data CSV file
+            cache: ExplanationCache to reuse explanations from (default: a new
+                in-memory cache; False disables caching)
+            renderer: PlotRenderer for the explanation charts (default: a new one)
         """
         self.model = pickle.load(open(model_path, 'rb'))
-        self.data = pd.read_csv(data_path)
+        # Cached explanations are only valid for these exact weights
+        self.model_version = file_sha256(model_path)[:16]
+        if cache is None:
+            cache = ExplanationCache()
+        self.cache = None if cache is False else cache
+        self.renderer = renderer or PlotRenderer()
         
         # Feature names - exactly 27 features
         self.feature_names = [
@@ -43,27 +141,42 @@ class ModelExplainer:
             'Age', 'Gender', 'HospAdmTime', 'ICULOS'
         ]
         
-        # Prepare training data for explainers
-        self.X_train = self.data[self.feature_names].values
+        self.quantization_steps = quantization_steps(self.feature_names)
+        
+        # Artifacts built next to the model at training time (python explainer_artifacts.py):
+        # weighted k-means SHAP background and LIME discretizer statistics
+        background = load_artifact(background_path(model_path))
+        lime_stats = load_artifact(lime_stats_path(model_path))
+        
+        self.data = None
+        self.X_train = None
+        if background is None or lime_stats is None:
+            print(f"[WARNING] Explainer artifacts for {model_path} not found; loading {data_path}")
+            # Only the 27 feature columns are read from the columnar cache
+            self.data = load_dataset(data_path, columns=self.feature_names)
+            self.X_train = self.data[self.feature_names].values
+            if background is None:
+                background = summarize_background(self.X_train)
         
-        # Initialize LIME explainer
+        # Initialize LIME explainer. With precomputed statistics, LIME only uses the
+        # training data for its shape, so the small background matrix stands in for it
         self.lime_explainer = lime.lime_tabular.LimeTabularExplainer(
-            self.X_train,
+            self.X_train if lime_stats is None else background['data'],
             feature_names=self.feature_names,
             class_names=['Low Risk', 'High Risk'],
             mode='classification',
-            verbose=False
+            verbose=False,
+            training_data_stats=lime_stats
         )
         
-        # Initialize SHAP explainer (using KernelExplainer for model-agnostic approach)
-        print("Initializing SHAP explainer... (this may take a moment)")
-        # Use a sample of data for SHAP background
-        self.background_data = shap.sample(self.X_train, 100)
-        self.shap_explainer = shap.KernelExplainer(
-            self.model.predict_proba,
-            self.background_data
-        )
-        print("SHAP explainer ready!")
+        # Initialize SHAP explainer: tree / linear / gradient backend by model type,
+        # KernelExplainer only for models without a fast path
+        print("Initializing SHAP explainer...")
+        self.background_data = background['data']
+        self.background_weights = background['weights']
+        self.shap_explainer = make_attribution(self.model, self.background_data, self.background_weights)
+        self.shap_backend = self.shap_explainer.name
+        print(f"SHAP explainer ready! (backend: {self.shap_backend})")
     
     def get_lime_explanation(self, instance, num_features=10):
         """
@@ -75,31 +188,21 @@ class ModelExplainer:
             
         Returns:
             dict: LIME explanation with feature contributions
+            (served from the explanation cache when an equivalent instance was explained)
         """
+        key = self._cache_key(instance, 'lime', num_features=num_features)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
         try:
-            exp = self.lime_explainer.explain_instance(
+            exp = _seeded_lime(self.lime_explainer).explain_instance(
                 instance,
                 self.model.predict_proba,
                 num_features=num_features
             )
-            
-            # Extract explanation as list of tuples
-            lime_exp = exp.as_list()
-            
-            # Format for JSON serialization
-            explanation = {
-                'method': 'LIME',
-                'prediction_class': 'High Risk' if exp.predict_proba[1] > 0.5 else 'Low Risk',
-                'confidence': float(max(exp.predict_proba)),
-                'features': []
-            }
-            
-            for feature_desc, weight in lime_exp:
-                explanation['features'].append({
-                    'feature': str(feature_desc),
-                    'contribution': float(weight)
-                })
-            
+            explanation = self._format_lime(exp)
+            self._cache_put(key, (explanation, LimeResult.from_explanation(exp)))
             return explanation, exp
         except Exception as e:
             print(f"LIME explanation error: {str(e)}")
@@ -114,7 +217,13 @@ class ModelExplainer:
             
         Returns:
             dict: SHAP explanation with feature importance
+            (served from the explanation cache when an equivalent instance was explained)
         """
+        key = self._cache_key(instance, 'shap', backend=self.shap_backend)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
         try:
             shap_values = self.shap_explainer.shap_values(instance)
             
@@ -125,95 +234,192 @@ class ModelExplainer:
                 shap_vals = shap_values
             
             prediction = self.model.predict(instance)[0]
-            
-            explanation = {
-                'method': 'SHAP',
-                'prediction': 'High Risk of Sepsis' if prediction == 1 else 'Low Risk of Sepsis',
-                'features': []
-            }
-            
-            # Get feature importances sorted by absolute value
-            feature_importance = list(zip(
-                self.feature_names,
-                shap_vals[0] if shap_vals.ndim > 1 else shap_vals
-            ))
-            feature_importance.sort(key=lambda x: abs(x[1]), reverse=True)
-            
-            for feature_name, importance in feature_importance[:10]:
-                explanation['features'].append({
-                    'feature': feature_name,
-                    'shap_value': float(importance),
-                    'direction': 'increases risk' if importance > 0 else 'decreases risk'
-                })
-            
+            explanation = self._format_shap(shap_vals[0] if shap_vals.ndim > 1 else shap_vals, prediction)
+            self._cache_put(key, (explanation, shap_values))
             return explanation, shap_values
         except Exception as e:
             print(f"SHAP explanation error: {str(e)}")
             return None, None
     
-    def create_lime_plot(self, exp):
+    def _format_lime(self, exp):
+        """JSON-serializable dict of a LIME explanation (or LimeResult)"""
+        # Extract explanation as list of tuples
+        lime_exp = exp.as_list()
+        
+        # Format for JSON serialization
+        explanation = {
+            'method': 'LIME',
+            'prediction_class': 'High Risk' if exp.predict_proba[1] > 0.5 else 'Low Risk',
+            'confidence': float(max(exp.predict_proba)),
+            'features': []
+        }
+        
+        for feature_desc, weight in lime_exp:
+            explanation['features'].append({
+                'feature': str(feature_desc),
+                'contribution': float(weight)
+            })
+        return explanation
+    
+    def _format_shap(self, shap_vals, prediction):
+        """JSON-serializable dict of one instance's (features,) SHAP values"""
+        explanation = {
+            'method': 'SHAP',
+            'backend': self.shap_backend,
+            'prediction': 'High Risk of Sepsis' if prediction == 1 else 'Low Risk of Sepsis',
+            'features': []
+        }
+        
+        # Get feature importances sorted by absolute value
+        feature_importance = list(zip(self.feature_names, shap_vals))
+        feature_importance.sort(key=lambda x: abs(x[1]), reverse=True)
+        
+        for feature_name, importance in feature_importance[:10]:
+            explanation['features'].append({
+                'feature': feature_name,
+                'shap_value': float(importance),
+                'direction': 'increases risk' if importance > 0 else 'decreases risk'
+            })
+        return explanation
+    
+    def explain_batch(self, X, method='shap', num_features=10, n_jobs=None,
+                      chunk_size=BATCH_CHUNK_SIZE):
+        """
+        Explain many instances, split across a process pool
+
+        Workers are forked from this process, so they share the loaded model and
+        background data instead of re-loading them. Within a chunk, SHAP runs one
+        vectorized attribution call, and LIME sends the perturbed samples of all
+        instances through a single predict_proba call.
+
+        Args:
+            X: (n, features) instances
+            method: 'shap' or 'lime'
+            num_features: Number of features to explain (LIME)
+            n_jobs: Worker processes (default: CPU count; 1 runs in this process)
+            chunk_size: Instances per task
+
+        Returns:
+            list: one (explanation, values) pair per row of X, in input order, as
+            returned by get_shap_explanation / get_lime_explanation (LIME values are
+            LimeResult objects). Failed rows give (None, None).
+        """
+        if method not in ('shap', 'lime'):
+            raise ValueError(f"Unknown explanation method: {method}")
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        params = {'backend': self.shap_backend} if method == 'shap' else {'num_features': num_features}
+        
+        # Only instances without a cached explanation are computed
+        keys = [self._cache_key(row, method, **params) for row in X]
+        results = [self._cache_get(key) for key in keys]
+        todo = np.array([i for i, result in enumerate(results) if result is None], dtype=int)
+        chunks = [todo[start:start + chunk_size] for start in range(0, len(todo), chunk_size)]
+        tasks = [(X[chunk], method, num_features) for chunk in chunks]
+        
+        n_jobs = min(n_jobs or os.cpu_count() or 1, len(tasks))
+        if n_jobs > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            global _POOL_EXPLAINER
+            _POOL_EXPLAINER = self
+            try:
+                with multiprocessing.get_context('fork').Pool(n_jobs) as pool:
+                    outputs = pool.map(_explain_chunk_task, tasks)
+            finally:
+                _POOL_EXPLAINER = None
+        else:
+            outputs = [self._explain_chunk(*task) for task in tasks]
+        
+        for chunk, output in zip(chunks, outputs):
+            for i, result in zip(chunk, output):
+                results[i] = result
+                if result[0] is not None:
+                    self._cache_put(keys[i], result)
+        return results
+    
+    def _explain_chunk(self, X, method, num_features):
+        """Uncached explanations for the rows of X (see explain_batch)"""
+        try:
+            if method == 'shap':
+                shap_vals = np.asarray(self.shap_explainer.shap_values(X))
+                predictions = self.model.predict(X)
+                return [(self._format_shap(values, prediction), values[None])
+                        for values, prediction in zip(shap_vals, predictions)]
+            
+            # One LIME run per instance in its own thread (each with its own seeded
+            # explainer); the threads' single predict_proba calls are gathered and
+            # answered by one call on the stacked samples
+            batcher = _PredictionBatcher(self.model.predict_proba, len(X))
+            
+            def explain(row):
+                try:
+                    exp = _seeded_lime(self.lime_explainer).explain_instance(
+                        row, batcher, num_features=num_features)
+                    result = LimeResult.from_explanation(exp)
+                    return self._format_lime(result), result
+                except Exception as e:
+                    print(f"LIME explanation error: {str(e)}")
+                    return None, None
+                finally:
+                    batcher.done()
+            
+            with ThreadPoolExecutor(max_workers=len(X)) as threads:
+                return list(threads.map(explain, X))
+        except Exception as e:
+            print(f"{method.upper()} batch explanation error: {str(e)}")
+            return [(None, None)] * len(X)
+    
+    def _cache_key(self, instance, method, **params):
+        if self.cache is None:
+            return None
+        return explanation_key(instance, self.quantization_steps, self.model_version, method, **params)
+
+    def _cache_get(self, key):
+        return None if key is None else self.cache.get(key)
+
+    def _cache_put(self, key, value):
+        if key is not None:
+            self.cache.put(key, value)
+
+    def create_lime_plot(self, exp, fmt='png', wait=True):
         """
         Create a visualization of LIME explanation
         
         Args:
-            exp: LIME explanation object
+            exp: LIME explanation object (or a cached LimeResult)
+            fmt: 'png' (base64 image), 'svg' (markup) or 'json' (bar list)
+            wait: Block for the rendered chart; False returns a Future instead
             
         Returns:
-            str: Base64 encoded image
+            str: Base64 encoded image (SVG markup / dict for the other formats)
         """
         try:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            fig.patch.set_facecolor('#0a0e27')
-            ax.set_facecolor('#1a1f3a')
-            
             # Get explanation data
             lime_exp = exp.as_list()
             features = [item[0] for item in lime_exp]
             values = [item[1] for item in lime_exp]
             
-            # Create bar plot
-            colors = ['#ffd700' if v > 0 else '#ff6b6b' for v in values]
-            ax.barh(features, values, color=colors, edgecolor='#ffd700', linewidth=1.5)
-            
-            ax.set_xlabel('Contribution to Prediction', color='#ffd700', fontsize=12, fontweight='bold')
-            ax.set_ylabel('Features', color='#ffd700', fontsize=12, fontweight='bold')
-            ax.set_title('LIME: Local Feature Importance', color='#ffd700', fontsize=14, fontweight='bold')
-            ax.tick_params(colors='#b0b0b0')
-            ax.spines['bottom'].set_color('#ffd700')
-            ax.spines['left'].set_color('#ffd700')
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            
-            plt.tight_layout()
-            
-            # Convert to base64
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png', facecolor='#0a0e27', edgecolor='none')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.read()).decode()
-            plt.close()
-            
-            return image_base64
+            future = self.renderer.submit(features, values, 'LIME: Local Feature Importance',
+                                          'Contribution to Prediction', fmt)
+            return future.result() if wait else future
         except Exception as e:
             print(f"LIME plot error: {str(e)}")
             return None
     
-    def create_shap_plot(self, instance, shap_values):
+    def create_shap_plot(self, instance, shap_values, fmt='png', wait=True):
         """
         Create a visualization of SHAP explanation
         
         Args:
             instance: Input features as numpy array
             shap_values: SHAP values from explainer
+            fmt: 'png' (base64 image), 'svg' (markup) or 'json' (bar list)
+            wait: Block for the rendered chart; False returns a Future instead
             
         Returns:
-            str: Base64 encoded image
+            str: Base64 encoded image (SVG markup / dict for the other formats)
         """
         try:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            fig.patch.set_facecolor('#0a0e27')
-            ax.set_facecolor('#1a1f3a')
-            
             # Get SHAP values for high-risk class
             if isinstance(shap_values, list):
                 shap_vals = shap_values[1][0]
@@ -226,33 +432,13 @@ class ModelExplainer:
             features_plot = [self.feature_names[i] for i in indices]
             values_plot = shap_vals[indices]
             
-            colors = ['#ffd700' if v > 0 else '#ff6b6b' for v in values_plot]
-            ax.barh(features_plot, values_plot, color=colors, edgecolor='#ffd700', linewidth=1.5)
-            
-            ax.set_xlabel('SHAP Value (Impact on Prediction)', color='#ffd700', fontsize=12, fontweight='bold')
-            ax.set_ylabel('Features', color='#ffd700', fontsize=12, fontweight='bold')
-            ax.set_title('SHAP: Global Feature Importance', color='#ffd700', fontsize=14, fontweight='bold')
-            ax.tick_params(colors='#b0b0b0')
-            ax.spines['bottom'].set_color('#ffd700')
-            ax.spines['left'].set_color('#ffd700')
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            
-            plt.tight_layout()
-            
-            # Convert to base64
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png', facecolor='#0a0e27', edgecolor='none')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.read()).decode()
-            plt.close()
-            
-            return image_base64
+            future = self.renderer.submit(features_plot, values_plot, 'SHAP: Global Feature Importance',
+                                          'SHAP Value (Impact on Prediction)', fmt)
+            return future.result() if wait else future
         except Exception as e:
             print(f"SHAP plot error: {str(e)}")
             return None
 
-
 def format_explanation_html(lime_dict, shap_dict):
     """
     Format explanations into HTML for display
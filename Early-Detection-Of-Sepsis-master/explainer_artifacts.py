@@ -0,0 +1,193 @@
+"""
+Explainer Artifacts
+Build-time summaries of the training data saved next to the model, so the explainer
+does not need sepsis.csv at serving time
+"""
+
+import argparse
+import os
+import pickle
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+from data_cache import DEFAULT_SOURCE, LABEL_COLUMN, DatasetCache
+
+EXPLAINER_FEATURES = [
+    'HR', 'O2Sat', 'Temp', 'SBP', 'MAP', 'DBP', 'Resp',
+    'BaseExcess', 'HCO3', 'FiO2', 'PaCO2', 'SaO2', 'Creatinine',
+    'Bilirubin_direct', 'Glucose', 'Lactate', 'Magnesium', 'Phosphate',
+    'Bilirubin_total', 'Hgb', 'WBC', 'Fibrinogen', 'Platelets',
+    'Age', 'Gender', 'HospAdmTime', 'ICULOS'
+]
+
+BACKGROUND_SIZE = 20
+# Rows sampled (stratified by label) before clustering
+BACKGROUND_MAX_ROWS = 100000
+
+
+def background_path(model_path):
+    """model.pkl -> model_background.pkl in the same directory"""
+    stem, _ = os.path.splitext(model_path)
+    return stem + '_background.pkl'
+
+
+def lime_stats_path(model_path):
+    """model.pkl -> model_lime_stats.pkl in the same directory"""
+    stem, _ = os.path.splitext(model_path)
+    return stem + '_lime_stats.pkl'
+
+
+def _stratified_rows(labels, max_rows, rng):
+    """Row indices per class, subsampled in proportion to the class sizes"""
+    rows = {}
+    for label in np.unique(labels):
+        index = np.flatnonzero(labels == label)
+        n = max(1, int(round(max_rows * len(index) / len(labels))))
+        rows[label] = np.sort(rng.choice(index, n, replace=False)) if n < len(index) else index
+    return rows
+
+
+def summarize_background(X, labels=None, n_points=BACKGROUND_SIZE, max_rows=BACKGROUND_MAX_ROWS,
+                         seed=0):
+    """
+    Weighted k-means summary of the training data, stratified by label
+
+    Each class gets clusters in proportion to its share of the rows (at least one),
+    and every center is weighted by the fraction of all rows in its cluster, so the
+    weighted background keeps the class prevalence of the data.
+
+    Args:
+        X: (rows, features) training matrix (missing values are filled with column means)
+        labels: Optional (rows,) class labels to stratify by
+        n_points: Total number of background points
+        max_rows: Rows sampled before clustering
+        seed: Random seed
+
+    Returns:
+        dict: data (n_points, features), weights (n_points,) summing to 1, labels
+    """
+    rng = np.random.default_rng(seed)
+    X = np.asarray(X, dtype=float)
+    labels = np.zeros(len(X), dtype=int) if labels is None else np.asarray(labels)
+    column_means = np.nanmean(X, axis=0)
+
+    data, weights, point_labels = [], [], []
+    for label, index in _stratified_rows(labels, max_rows, rng).items():
+        share = np.mean(labels == label)
+        k = min(len(index), max(1, int(round(n_points * share))))
+        rows = X[index]
+        rows = np.where(np.isnan(rows), column_means, rows)
+        kmeans = MiniBatchKMeans(n_clusters=k, random_state=seed, n_init=3,
+                                 batch_size=4096).fit(rows)
+        counts = np.bincount(kmeans.labels_, minlength=k)
+        data.append(kmeans.cluster_centers_)
+        weights.append(share * counts / counts.sum())
+        point_labels.append(np.full(k, label))
+
+    return {
+        'data': np.concatenate(data),
+        'weights': np.concatenate(weights),
+        'labels': np.concatenate(point_labels),
+    }
+
+
+def build_background(columns, labels, feature_names, n_points=BACKGROUND_SIZE, seed=0):
+    """
+    Summarize per-column (memory-mapped) training data into a background artifact
+
+    Only the sampled rows are gathered from the columns.
+    """
+    rng = np.random.default_rng(seed)
+    labels = np.asarray(labels)
+    rows = np.sort(np.concatenate(list(_stratified_rows(labels, BACKGROUND_MAX_ROWS, rng).values())))
+    X = np.column_stack([np.asarray(column[rows], dtype=float) for column in columns])
+    background = summarize_background(X, labels[rows], n_points=n_points, max_rows=len(rows),
+                                      seed=seed)
+    background['feature_names'] = list(feature_names)
+    background['method'] = 'stratified-kmeans'
+    return background
+
+
+def lime_training_stats(columns, feature_names):
+    """
+    LIME training_data_stats for the default quartile discretizer, one column at a time
+
+    Computes exactly what LimeTabularExplainer derives from the full training matrix:
+    quartile bins, per-bin means/stds/mins/maxs and the frequency of each bin.
+    Missing values are ignored.
+
+    Args:
+        columns: Per-feature 1-D arrays (e.g. memory-mapped cache columns)
+        feature_names: Name of each column
+
+    Returns:
+        dict accepted by LimeTabularExplainer(training_data_stats=...)
+    """
+    stats = {key: {} for key in ('means', 'stds', 'mins', 'maxs', 'bins',
+                                 'feature_values', 'feature_frequencies')}
+    for feature, column in enumerate(columns):
+        values = np.asarray(column, dtype=float)
+        values = values[~np.isnan(values)]
+        qts = np.unique(np.percentile(values, [25, 50, 75]))
+        discretized = np.searchsorted(qts, values)
+
+        means, stds = [], []
+        for x in range(len(qts) + 1):
+            selection = values[discretized == x]
+            means.append(0 if len(selection) == 0 else float(np.mean(selection)))
+            stds.append((0 if len(selection) == 0 else float(np.std(selection))) + 0.00000000001)
+
+        counts = np.bincount(discretized, minlength=len(qts) + 1)
+        present = np.flatnonzero(counts)
+        stats['means'][feature] = means
+        stats['stds'][feature] = stds
+        stats['mins'][feature] = [float(values.min())] + qts.tolist()
+        stats['maxs'][feature] = qts.tolist() + [float(values.max())]
+        stats['bins'][feature] = qts.tolist()
+        stats['feature_values'][feature] = present.tolist()
+        stats['feature_frequencies'][feature] = counts[present].tolist()
+
+    stats['feature_names'] = list(feature_names)
+    stats['discretizer'] = 'quartile'
+    return stats
+
+
+def save_artifact(artifact, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(artifact, f)
+    os.replace(tmp, path)
+
+
+def load_artifact(path):
+    """Artifact dict, or None when the file does not exist"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def build_explainer_artifacts(data_path=DEFAULT_SOURCE, model_path='model.pkl',
+                              feature_names=EXPLAINER_FEATURES, n_points=BACKGROUND_SIZE):
+    """Build and save the explainer artifacts for model_path from the dataset"""
+    dataset = DatasetCache(data_path)
+    columns = [dataset.column(name) for name in feature_names]
+    labels = dataset.column(LABEL_COLUMN)
+
+    background = build_background(columns, labels, feature_names, n_points=n_points)
+    save_artifact(background, background_path(model_path))
+    print(f"✓ SHAP background ({len(background['data'])} weighted points) saved to: "
+          f"{background_path(model_path)}")
+
+    save_artifact(lime_training_stats(columns, feature_names), lime_stats_path(model_path))
+    print(f"✓ LIME training statistics saved to: {lime_stats_path(model_path)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build explainer artifacts next to a model')
+    parser.add_argument('--data', default=DEFAULT_SOURCE)
+    parser.add_argument('--model', default='model.pkl')
+    parser.add_argument('--background-size', type=int, default=BACKGROUND_SIZE)
+    args = parser.parse_args()
+    build_explainer_artifacts(args.data, args.model, n_points=args.background_size)
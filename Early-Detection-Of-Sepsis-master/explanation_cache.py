@@ -0,0 +1,185 @@
+"""
+Explanation Cache
+Reuses SHAP/LIME explanations for patients whose features have not changed meaningfully
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Quantization step per feature: values closer than this are treated as identical.
+# Steps follow the precision the measurements are charted at. ICULOS is bucketed
+# to 4 hours so a stable patient re-scored every hour reuses the explanation.
+QUANTIZATION_STEPS = {
+    'HR': 1, 'O2Sat': 1, 'Temp': 0.1, 'SBP': 1, 'MAP': 1, 'DBP': 1, 'Resp': 1,
+    'BaseExcess': 1, 'HCO3': 1, 'FiO2': 0.01, 'PaCO2': 1, 'SaO2': 1, 'Creatinine': 0.1,
+    'Bilirubin_direct': 0.1, 'Glucose': 1, 'Lactate': 0.1, 'Magnesium': 0.1, 'Phosphate': 0.1,
+    'Bilirubin_total': 0.1, 'Hgb': 0.1, 'WBC': 0.1, 'Fibrinogen': 1, 'Platelets': 1,
+    'Age': 1, 'Gender': 1, 'HospAdmTime': 1, 'ICULOS': 4,
+}
+DEFAULT_STEP = 0.01
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 6 * 3600  # seconds
+
+# Quantized value used for missing (NaN) measurements
+MISSING_CODE = np.iinfo(np.int64).min
+
+
+def quantization_steps(feature_names, steps=None):
+    """(features,) array of quantization steps in feature order"""
+    steps = QUANTIZATION_STEPS if steps is None else steps
+    return np.array([steps.get(name, DEFAULT_STEP) for name in feature_names], dtype=float)
+
+
+def explanation_key(instance, steps, model_version, method, **params):
+    """
+    Cache key for one explanation
+
+    Args:
+        instance: (features,) or (1, features) feature vector
+        steps: (features,) quantization steps (see quantization_steps)
+        model_version: Identifier of the model weights the explanation belongs to
+        method: 'shap' or 'lime'
+        **params: Explanation parameters that change the result (e.g. num_features)
+
+    Returns:
+        str: hex digest
+    """
+    x = np.asarray(instance, dtype=float).ravel()
+    missing = np.isnan(x)
+    codes = np.round(np.where(missing, 0.0, x) / steps).astype(np.int64)
+    codes[missing] = MISSING_CODE
+
+    digest = hashlib.sha256(codes.tobytes())
+    digest.update(f"|{model_version}|{method}|{sorted(params.items())}".encode())
+    return digest.hexdigest()
+
+
+class LimeResult:
+    """Picklable stand-in for a LIME Explanation: what create_lime_plot needs"""
+
+    def __init__(self, weights, predict_proba):
+        self.weights = list(weights)
+        self.predict_proba = np.asarray(predict_proba)
+
+    @classmethod
+    def from_explanation(cls, exp):
+        return cls(exp.as_list(), exp.predict_proba)
+
+    def as_list(self):
+        return list(self.weights)
+
+
+class ExplanationCache:
+    """Thread-safe LRU cache with TTL expiry, a memory budget and optional persistence"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, path=None):
+        """
+        Args:
+            max_bytes: Budget for the pickled size of all cached values
+            ttl: Seconds an entry stays valid (None: no expiry)
+            path: Optional file the cache is loaded from and saved to
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (created, size, payload bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[0], now):
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            payload = entry[2]
+        return pickle.loads(payload)
+
+    def put(self, key, value):
+        """Store value (stored pickled, so callers cannot mutate cached results)"""
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time(), len(payload), payload)
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def save(self, path=None):
+        """Write the unexpired entries to path (atomically)"""
+        path = path or self.path
+        now = time.time()
+        with self._lock:
+            entries = [(key, entry) for key, entry in self._entries.items()
+                       if not self._expired(entry[0], now)]
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def load(self, path=None):
+        """Merge entries saved by save(); expired entries are dropped"""
+        path = path or self.path
+        try:
+            with open(path, 'rb') as f:
+                entries = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"[WARNING] Could not load explanation cache {path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, entry in entries:
+                if self._expired(entry[0], now) or key in self._entries:
+                    continue
+                self._entries[key] = entry
+                self._bytes += entry[1]
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
@@ -0,0 +1,36 @@
+"""
+Gunicorn configuration for production serving
+Usage: gunicorn -c gunicorn.conf.py app:app
+
+Models are loaded once in the master (preload_app) and shared copy-on-write
+by the forked workers.
+"""
+
+import os
+
+from serving_memory import freeze_after_load, memory_report
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+preload_app = True
+timeout = 60
+
+
+def when_ready(server):
+    """Runs in the master after app.py (and its models) are loaded, before forking"""
+    frozen = freeze_after_load()
+    report = memory_report()
+    server.log.info("Froze %d objects into the permanent GC generation", frozen)
+    if report:
+        server.log.info("Master RSS after model load: %.1f MB", report['rss'])
+
+
+def post_worker_init(worker):
+    """Startup check: how much memory each worker holds privately"""
+    report = memory_report()
+    if report:
+        worker.log.info(
+            "Worker %s memory: private %.1f MB, shared %.1f MB, PSS %.1f MB",
+            worker.pid, report['private_total'],
+            report.get('shared_clean', 0) + report.get('shared_dirty', 0), report['pss']
+        )
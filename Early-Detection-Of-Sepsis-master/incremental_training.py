@@ -0,0 +1,293 @@
+"""
+Incremental Retraining
+Warm-starts a saved MLP and scaler on new ICU rows with partial_fit, and replaces the
+artifacts only when the update holds up on held-out rows
+"""
+
+import argparse
+import copy
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from balanced_sampling import BalancedSampler, gather_rows, partial_fit_balanced
+from cross_validation import threshold_metrics
+from data_cache import DatasetCache, LABEL_COLUMN
+from explainer_artifacts import (EXPLAINER_FEATURES, background_path, build_explainer_artifacts,
+                                 lime_stats_path, save_artifact)
+from model_registry import BASE_FEATURES, MANIFEST
+
+EPOCHS = 5
+BATCH_SIZE = 256
+VALIDATION_FRACTION = 0.2
+# Largest held-out ROC-AUC drop an update may cause and still replace the artifacts
+MAX_AUC_DROP = 0.0
+# partial_fit only exists for the stochastic solvers; lbfgs models are switched to this
+INCREMENTAL_SOLVER = 'adam'
+# Rows per prediction call when scoring the held-out set
+PREDICT_CHUNK_SIZE = 50000
+# --scaler value for a model that takes unscaled inputs
+NO_SCALER = 'none'
+
+
+def warm_start_model(model, learning_rate_init=None):
+    """
+    Copy of a fitted MLPClassifier ready for partial_fit
+
+    The copy keeps the learned weights. lbfgs models are switched to INCREMENTAL_SOLVER
+    (a fresh optimizer state starts from the current weights), early stopping is
+    turned off because partial_fit rejects it, and per-call verbose output is silenced.
+
+    Args:
+        model: Fitted MLPClassifier
+        learning_rate_init: Optional new step size (also resets the optimizer state)
+    """
+    model = copy.deepcopy(model)
+    params = {'early_stopping': False, 'verbose': False}
+    if model.solver not in ('adam', 'sgd'):
+        print(f"[INFO] Switching solver {model.solver} -> {INCREMENTAL_SOLVER} for partial_fit")
+        params['solver'] = INCREMENTAL_SOLVER
+    if learning_rate_init is not None:
+        params['learning_rate_init'] = learning_rate_init
+    model.set_params(**params)
+    # lbfgs fits keep no loss curve, and early-stopping fits track validation scores
+    # instead of the best loss; partial_fit needs both
+    if not hasattr(model, 'loss_curve_'):
+        model.loss_curve_ = [model.loss_]
+        model._no_improvement_count = 0
+    if getattr(model, 'best_loss_', None) is None:
+        model.best_loss_ = min(model.loss_curve_)
+    if ('solver' in params or learning_rate_init is not None) and hasattr(model, '_optimizer'):
+        # partial_fit builds a new optimizer with the new settings when none exists
+        del model._optimizer
+    return model
+
+
+def feature_names_for(model, dataset):
+    """
+    Input columns of a saved model: the 27 BASE_FEATURES, or the first
+    n_features_in_ dataset columns for the positional 40-feature trainers
+    """
+    n_features = model.n_features_in_
+    if n_features == len(BASE_FEATURES):
+        return list(BASE_FEATURES)
+    return dataset.columns[:n_features]
+
+
+def default_scaler_path(model_path):
+    """
+    Scaler listed next to a model file in the registry MANIFEST (model.pkl -> scaler.pkl),
+    or None for a model file the manifest does not know
+    """
+    directory, filename = os.path.split(model_path)
+    for spec in MANIFEST.values():
+        if spec['model'] == filename and spec['scaler']:
+            return os.path.join(directory, spec['scaler'])
+    return None
+
+
+def load_scaler(model, scaler_path=None, model_path='model.pkl'):
+    """
+    Scaler that belongs to a model, or None when the model takes unscaled inputs
+
+    Args:
+        model: Fitted model (its n_features_in_ must match the scaler)
+        scaler_path: Scaler file, NO_SCALER for none, or None for default_scaler_path
+        model_path: Model file, used to find the default scaler
+
+    Raises:
+        ValueError: an explicitly given scaler does not match the model
+    """
+    if scaler_path is not None and scaler_path.lower() == NO_SCALER:
+        return None
+    explicit = scaler_path is not None
+    if not explicit:
+        scaler_path = default_scaler_path(model_path)
+        if scaler_path is None or not os.path.exists(scaler_path):
+            print(f"[INFO] No scaler for {model_path}; updating on unscaled inputs")
+            return None
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+    if scaler.n_features_in_ == model.n_features_in_:
+        return scaler
+    message = (f"{scaler_path} expects {scaler.n_features_in_} features, "
+               f"{model_path} takes {model.n_features_in_}")
+    if explicit:
+        raise ValueError(message)
+    # e.g. the positional 40-feature trainers save model.pkl without a scaler
+    print(f"[INFO] {message}; updating on unscaled inputs")
+    return None
+
+
+def predict_proba_rows(model, scaler, columns, index):
+    """Positive-class probabilities for rows of the cached columns, in chunks"""
+    positive = list(model.classes_).index(1)
+    out = np.empty(len(index))
+    for start in range(0, len(index), PREDICT_CHUNK_SIZE):
+        X = gather_rows(columns, index[start:start + PREDICT_CHUNK_SIZE])
+        if scaler is not None:
+            X = scaler.transform(X)
+        out[start:start + PREDICT_CHUNK_SIZE] = model.predict_proba(X)[:, positive]
+    return out
+
+
+def incremental_update(model, scaler, columns, labels, epochs=EPOCHS, batch_size=BATCH_SIZE,
+                       validation_fraction=VALIDATION_FRACTION, learning_rate_init=None,
+                       max_auc_drop=MAX_AUC_DROP, random_state=0):
+    """
+    Update a model and scaler on new rows and validate the result
+
+    The new rows are split into training and held-out rows (stratified). The
+    scaler statistics are updated with partial_fit on the balanced training rows,
+    then the model runs partial_fit epochs over balanced minibatches streamed from
+    the cached columns. The current and updated model are scored on the same
+    held-out rows. The inputs are not modified.
+
+    Args:
+        model, scaler: The deployed MLPClassifier and its StandardScaler (None: unscaled inputs)
+        columns: Per-column feature arrays of the new data (memory-mapped cache columns)
+        labels: (rows,) 0/1 labels of the new data
+        epochs: partial_fit passes over the balanced training rows
+        batch_size: Rows per partial_fit call
+        validation_fraction: Share of the new rows held out
+        learning_rate_init: Optional step size for the update
+        max_auc_drop: Largest held-out ROC-AUC loss that still accepts the update
+        random_state: Seed for the split and the minibatch order
+
+    Returns:
+        dict: model, scaler (updated copies), before and after (held-out metrics),
+        accepted, n_train, n_holdout, seconds
+
+    Raises:
+        ValueError: the new rows do not contain both classes
+    """
+    labels = np.asarray(labels).astype(int)
+    if len(np.unique(labels)) < 2:
+        raise ValueError("New data must contain both sepsis and non-sepsis rows")
+    start = time.perf_counter()
+
+    rows = np.arange(len(labels))
+    train_rows, holdout_rows = train_test_split(rows, test_size=validation_fraction,
+                                                stratify=labels, random_state=random_state)
+    # Minority upsampling within the training rows, as in the original training
+    sampler = BalancedSampler(labels[train_rows], random_state=random_state)
+    train_idx = train_rows[sampler.indices()]
+    holdout_rows = np.sort(holdout_rows)
+
+    updated_model = warm_start_model(model, learning_rate_init)
+    updated_scaler = copy.deepcopy(scaler)
+    partial_fit_balanced(updated_model, columns, labels, sampler, train_idx, epochs=epochs,
+                         batch_size=batch_size, scaler=updated_scaler, classes=model.classes_,
+                         seed=random_state)
+
+    y_holdout = labels[holdout_rows]
+    before = threshold_metrics(y_holdout, predict_proba_rows(model, scaler, columns, holdout_rows))
+    after = threshold_metrics(y_holdout, predict_proba_rows(updated_model, updated_scaler,
+                                                            columns, holdout_rows))
+    return {
+        'model': updated_model,
+        'scaler': updated_scaler,
+        'before': before,
+        'after': after,
+        'accepted': after['roc_auc'] >= before['roc_auc'] - max_auc_drop,
+        'n_train': len(train_idx),
+        'n_holdout': len(holdout_rows),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def replace_artifacts(model, scaler, model_path, scaler_path, keep_previous=True):
+    """
+    Atomically replace the model and scaler files (each is written to a temporary
+    file and renamed), keeping the old files as <path>.prev for rollback. A None
+    scaler (model without scaling) leaves the scaler files alone.
+    """
+    for obj, path in ((model, model_path), (scaler, scaler_path)):
+        if obj is None or path is None:
+            continue
+        if keep_previous:
+            shutil.copy2(path, path + '.prev')
+        save_artifact(obj, path)
+
+
+def refresh_explainer_artifacts(data_path, model_path, feature_names, keep_previous=True):
+    """
+    Rebuild the SHAP background and LIME statistics saved next to a replaced model
+    from the data it was updated on (old files kept as <path>.prev)
+
+    Models on other inputs than the explainer's 27 features are skipped unless
+    they already have artifacts.
+    """
+    paths = (background_path(model_path), lime_stats_path(model_path))
+    if list(feature_names) != EXPLAINER_FEATURES and not any(os.path.exists(p) for p in paths):
+        print(f"[INFO] {model_path} has no explainer artifacts to rebuild")
+        return
+    if keep_previous:
+        for path in paths:
+            if os.path.exists(path):
+                shutil.copy2(path, path + '.prev')
+    build_explainer_artifacts(data_path, model_path, feature_names)
+
+
+def retrain(data_path, model_path='model.pkl', scaler_path=None, epochs=EPOCHS,
+            batch_size=BATCH_SIZE, learning_rate_init=None, max_auc_drop=MAX_AUC_DROP,
+            dry_run=False):
+    """
+    Run incremental_update on a CSV of new rows and save the result if it is accepted
+
+    scaler_path is resolved by load_scaler (None: the model's own scaler, if any;
+    NO_SCALER: unscaled inputs).
+    """
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    scaler = load_scaler(model, scaler_path, model_path)
+    if scaler is not None and scaler_path is None:
+        scaler_path = default_scaler_path(model_path)
+
+    dataset = DatasetCache(data_path)
+    feature_names = feature_names_for(model, dataset)
+    columns = [dataset.column(name) for name in feature_names]
+    labels = dataset.column(LABEL_COLUMN)
+    print(f"[INFO] {len(labels)} new rows ({int(np.sum(labels))} sepsis), {len(feature_names)} features")
+
+    result = incremental_update(model, scaler, columns, labels, epochs=epochs, batch_size=batch_size,
+                                learning_rate_init=learning_rate_init, max_auc_drop=max_auc_drop)
+    print(f"[INFO] {epochs} partial_fit epochs over {result['n_train']} balanced rows "
+          f"in {result['seconds']:.1f} s")
+    for name in ('roc_auc', 'accuracy', 'recall', 'precision'):
+        print(f"  {name}: {result['before'][name]:.4f} -> {result['after'][name]:.4f} "
+              f"({result['n_holdout']} held-out rows)")
+
+    if not result['accepted']:
+        print(f"[WARNING] Held-out ROC-AUC dropped by more than {max_auc_drop}; keeping {model_path}")
+    elif dry_run:
+        print("[INFO] Update accepted (dry run, nothing saved)")
+    else:
+        replace_artifacts(result['model'], result['scaler'], model_path, scaler_path)
+        print(f"✓ Updated model saved to: {model_path} (previous: {model_path}.prev)")
+        if result['scaler'] is not None:
+            print(f"✓ Updated scaler saved to: {scaler_path} (previous: {scaler_path}.prev)")
+        refresh_explainer_artifacts(data_path, model_path, feature_names)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Warm-start a saved MLP on new ICU data')
+    parser.add_argument('--data', required=True, help='CSV of new rows (same columns as sepsis.csv)')
+    parser.add_argument('--model', default='model.pkl')
+    parser.add_argument('--scaler', default=None,
+                        help=f"Scaler file (default: the model's scaler from the registry manifest, "
+                             f"if it matches; '{NO_SCALER}' for unscaled inputs)")
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--learning-rate', type=float, default=None)
+    parser.add_argument('--max-auc-drop', type=float, default=MAX_AUC_DROP)
+    parser.add_argument('--dry-run', action='store_true', help='Validate without saving')
+    args = parser.parse_args()
+    retrain(args.data, args.model, args.scaler, epochs=args.epochs, batch_size=args.batch_size,
+            learning_rate_init=args.learning_rate, max_auc_drop=args.max_auc_drop,
+            dry_run=args.dry_run)
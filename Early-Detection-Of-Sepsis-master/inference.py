@@ -0,0 +1,68 @@
+"""
+Serving Inference
+Single forward pass per request or batch, shared by every consumer in app.py
+"""
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.5
+
+
+class SepsisPredictor:
+    """Scaler + model + probability scaling behind one predict() call"""
+
+    def __init__(self, model, scaler=None, scaling_params=None, threshold=DEFAULT_THRESHOLD,
+                 version='Phase 1 MLP'):
+        """
+        Args:
+            model: Fitted classifier exposing predict_proba
+            scaler: Optional fitted feature scaler (applied before the model)
+            scaling_params: Optional {'prob_min', 'prob_max'} linear probability scaling
+            threshold: Decision threshold applied to the calibrated probability
+            version: Human readable model description shown in the UI
+        """
+        self.model = model
+        self.scaler = scaler
+        self.scaling_params = scaling_params
+        self.threshold = threshold
+        self.version = version
+        classes = list(getattr(model, 'classes_', [0, 1]))
+        self.positive_index = classes.index(1) if 1 in classes else len(classes) - 1
+
+    @property
+    def n_features(self):
+        return getattr(self.model, 'n_features_in_', None)
+
+    def calibrate(self, prob_raw):
+        """
+        Map raw model probabilities onto the full [0, 1] range using scaling_params
+        Works on scalars and NumPy arrays alike
+        """
+        prob = np.asarray(prob_raw, dtype=float)
+        if self.scaling_params is not None:
+            prob_min = self.scaling_params['prob_min']
+            prob_max = self.scaling_params['prob_max']
+            prob = (prob - prob_min) / (prob_max - prob_min)
+        return np.clip(prob, 0.0, 1.0)
+
+    def predict(self, X):
+        """
+        Score an (N, features) matrix of unscaled clinical values
+
+        Returns:
+            dict of (N,) arrays: probability_raw, probability (calibrated) and prediction
+        """
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+
+        # One forward pass; the class is derived from the calibrated probability
+        prob_raw = self.model.predict_proba(X)[:, self.positive_index]
+        prob = self.calibrate(prob_raw)
+        return {
+            'probability_raw': prob_raw,
+            'probability': prob,
+            'prediction': (prob >= self.threshold).astype(int),
+        }
@@ -0,0 +1,221 @@
+"""
+NumPy Inference for the Phase 3 LSTM
+Exports the trained Keras model to a compact .npz artifact and runs its forward pass
+(Bidirectional LSTM + MultiHeadAttention + LayerNormalization + Dense) without TensorFlow
+"""
+
+import json
+
+import numpy as np
+
+DEFAULT_EXPORT_PATH = 'model_phase3_lstm.npz'
+PARITY_TOLERANCE = 1e-4
+
+SUPPORTED_LAYERS = ('InputLayer', 'Bidirectional', 'MultiHeadAttention', 'Add',
+                    'LayerNormalization', 'Dense', 'Dropout')
+ACTIVATIONS = ('linear', 'relu', 'sigmoid', 'tanh', 'softmax')
+
+
+# ============================================================================
+# Export (takes a loaded Keras model; TensorFlow is only needed by the caller)
+# ============================================================================
+
+def _activation_name(fn):
+    name = getattr(fn, '__name__', str(fn))
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation for NumPy export: {name}")
+    return name
+
+
+def _lstm_spec(lstm):
+    if getattr(lstm, 'use_bias', True) is False:
+        raise ValueError("NumPy export expects LSTM layers with bias")
+    return {
+        'units': int(lstm.units),
+        'activation': _activation_name(lstm.activation),
+        'recurrent_activation': _activation_name(lstm.recurrent_activation),
+    }
+
+
+def export_lstm_model(model, path=DEFAULT_EXPORT_PATH):
+    """
+    Write the weights and layer sequence of a Phase 3 Keras model to an .npz file
+
+    The model must be a chain of the SUPPORTED_LAYERS, where an Add layer adds the
+    output of the preceding MultiHeadAttention (self-attention) to its input.
+
+    Raises:
+        ValueError: the model uses a layer or option the NumPy runtime lacks
+    """
+    specs, arrays = [], {}
+    for i, layer in enumerate(model.layers):
+        kind = type(layer).__name__
+        if kind not in SUPPORTED_LAYERS:
+            raise ValueError(f"Unsupported layer for NumPy export: {layer.name} ({kind})")
+        if kind in ('InputLayer', 'Dropout'):
+            continue
+
+        spec = {'type': kind, 'name': layer.name}
+        weights = layer.get_weights()
+        if kind == 'Bidirectional':
+            if layer.merge_mode != 'concat':
+                raise ValueError(f"Unsupported merge_mode for NumPy export: {layer.merge_mode}")
+            spec.update(_lstm_spec(layer.forward_layer))
+            spec['return_sequences'] = bool(layer.forward_layer.return_sequences)
+            names = ['forward_kernel', 'forward_recurrent', 'forward_bias',
+                     'backward_kernel', 'backward_recurrent', 'backward_bias']
+        elif kind == 'MultiHeadAttention':
+            spec['key_dim'] = int(layer._key_dim)
+            names = ['query_kernel', 'query_bias', 'key_kernel', 'key_bias',
+                     'value_kernel', 'value_bias', 'output_kernel', 'output_bias']
+        elif kind == 'LayerNormalization':
+            spec['epsilon'] = float(layer.epsilon)
+            names = ['gamma', 'beta']
+        elif kind == 'Dense':
+            spec['activation'] = _activation_name(layer.activation)
+            names = ['kernel', 'bias']
+        else:  # Add
+            names = []
+
+        if len(weights) != len(names):
+            raise ValueError(f"Unexpected weights for {layer.name}: {len(weights)} arrays")
+        for name, weight in zip(names, weights):
+            arrays[f"{i}/{name}"] = np.asarray(weight, dtype=np.float32)
+        spec['index'] = i
+        specs.append(spec)
+
+    arrays['__spec__'] = np.array(json.dumps({
+        'input_shape': [int(d) for d in model.input_shape[1:]],
+        'layers': specs,
+    }))
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+    return path
+
+
+def check_export_parity(keras_model, numpy_model, X, tolerance=PARITY_TOLERANCE):
+    """
+    Compare the NumPy forward pass with Keras on the same inputs
+
+    Returns:
+        float: largest absolute probability difference
+
+    Raises:
+        ValueError: the difference exceeds tolerance
+    """
+    expected = np.asarray(keras_model.predict(X, verbose=0))[:, 0]
+    actual = numpy_model.predict(X)
+    difference = float(np.max(np.abs(expected - actual))) if len(X) else 0.0
+    if difference > tolerance:
+        raise ValueError(f"NumPy export differs from Keras by {difference:.2e} (> {tolerance:.0e})")
+    return difference
+
+
+# ============================================================================
+# Runtime
+# ============================================================================
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _softmax(z, axis=-1):
+    z = z - z.max(axis=axis, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=axis, keepdims=True)
+
+
+_ACTIVATION_FNS = {
+    'linear': lambda z: z,
+    'relu': lambda z: np.maximum(z, 0),
+    'sigmoid': _sigmoid,
+    'tanh': np.tanh,
+    'softmax': _softmax,
+}
+
+
+def _lstm(X, kernel, recurrent, bias, activation, recurrent_activation, reverse=False):
+    """One LSTM direction over (N, T, F) inputs; returns all hidden states (N, T, units)"""
+    act, rec_act = _ACTIVATION_FNS[activation], _ACTIVATION_FNS[recurrent_activation]
+    n, steps, _ = X.shape
+    units = recurrent.shape[0]
+    # Input projections of every timestep in one matmul
+    projected = X @ kernel + bias
+    h = np.zeros((n, units), dtype=X.dtype)
+    c = np.zeros((n, units), dtype=X.dtype)
+    outputs = np.empty((n, steps, units), dtype=X.dtype)
+    order = range(steps - 1, -1, -1) if reverse else range(steps)
+    for t in order:
+        z = projected[:, t] + h @ recurrent
+        # Keras gate order: input, forget, cell, output
+        i = rec_act(z[:, :units])
+        f = rec_act(z[:, units:2 * units])
+        c = f * c + i * act(z[:, 2 * units:3 * units])
+        o = rec_act(z[:, 3 * units:])
+        h = o * act(c)
+        outputs[:, t] = h
+    return outputs
+
+
+class NumpyLSTMModel:
+    """Forward pass of an exported Phase 3 model in NumPy (inference only)"""
+
+    def __init__(self, path=DEFAULT_EXPORT_PATH):
+        with np.load(path) as data:
+            spec = json.loads(str(data['__spec__']))
+            self.weights = {key: data[key] for key in data.files if key != '__spec__'}
+        self.input_shape = tuple(spec['input_shape'])
+        self.layers = spec['layers']
+
+    def _w(self, spec, name):
+        return self.weights[f"{spec['index']}/{name}"]
+
+    def _bidirectional(self, spec, x):
+        forward = _lstm(x, self._w(spec, 'forward_kernel'), self._w(spec, 'forward_recurrent'),
+                        self._w(spec, 'forward_bias'), spec['activation'], spec['recurrent_activation'])
+        backward = _lstm(x, self._w(spec, 'backward_kernel'), self._w(spec, 'backward_recurrent'),
+                         self._w(spec, 'backward_bias'), spec['activation'],
+                         spec['recurrent_activation'], reverse=True)
+        if spec['return_sequences']:
+            return np.concatenate((forward, backward), axis=-1)
+        # Last state of each direction: the forward pass ends at T-1, the backward at 0
+        return np.concatenate((forward[:, -1], backward[:, 0]), axis=-1)
+
+    def _attention(self, spec, x):
+        # Self-attention; einsum subscripts: b batch, t/s timesteps, h heads, d key_dim, e model dim
+        query = np.einsum('bte,ehd->bthd', x, self._w(spec, 'query_kernel')) + self._w(spec, 'query_bias')
+        key = np.einsum('bse,ehd->bshd', x, self._w(spec, 'key_kernel')) + self._w(spec, 'key_bias')
+        value = np.einsum('bse,ehd->bshd', x, self._w(spec, 'value_kernel')) + self._w(spec, 'value_bias')
+        query = query / np.sqrt(np.float32(spec['key_dim']))
+        scores = _softmax(np.einsum('bthd,bshd->bhts', query, key), axis=-1)
+        context = np.einsum('bhts,bshd->bthd', scores, value)
+        return np.einsum('bthd,hde->bte', context, self._w(spec, 'output_kernel')) + self._w(spec, 'output_bias')
+
+    def _layer_norm(self, spec, x):
+        mean = x.mean(axis=-1, keepdims=True)
+        variance = x.var(axis=-1, keepdims=True)
+        normalized = (x - mean) / np.sqrt(variance + spec['epsilon'])
+        return normalized * self._w(spec, 'gamma') + self._w(spec, 'beta')
+
+    def predict(self, X):
+        """
+        Probabilities for scaled (N, timesteps, features) sequences
+
+        Returns:
+            (N,) array
+        """
+        x = np.asarray(X, dtype=np.float32)
+        attention = None
+        for spec in self.layers:
+            kind = spec['type']
+            if kind == 'Bidirectional':
+                x = self._bidirectional(spec, x)
+            elif kind == 'MultiHeadAttention':
+                attention = self._attention(spec, x)
+            elif kind == 'Add':
+                x = x + attention
+            elif kind == 'LayerNormalization':
+                x = self._layer_norm(spec, x)
+            elif kind == 'Dense':
+                x = _ACTIVATION_FNS[spec['activation']](x @ self._w(spec, 'kernel') + self._w(spec, 'bias'))
+        return x[:, 0]
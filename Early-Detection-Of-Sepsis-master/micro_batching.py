@@ -0,0 +1,122 @@
+"""
+Micro-Batching Scheduler
+Queues single-sequence inference requests from many callers and runs them as one batch
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+MAX_BATCH_SIZE = 64
+MAX_WAIT = 0.005  # seconds the first request of a batch waits for company
+
+_STOP = object()
+
+
+class MicroBatchScheduler:
+    """
+    Collects requests on a queue; a background thread flushes them as one stacked
+    array when max_batch_size requests are waiting or the oldest has waited max_wait
+    """
+
+    def __init__(self, predict_fn, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT):
+        """
+        Args:
+            predict_fn: Maps a stacked (N, ...) array to N results (e.g. probabilities)
+            max_batch_size: Most requests per predict_fn call
+            max_wait: Seconds to wait for more requests after the first one arrives
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so a scheduler created before gunicorn forks
+        # starts its own worker thread in each process on first use
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='micro-batch', daemon=True)
+                self._thread.start()
+
+    def submit(self, x):
+        """
+        Queue one input (without the batch dimension)
+
+        Returns:
+            Future resolving to this input's result
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((np.asarray(x), future))
+        return future
+
+    def predict(self, x, timeout=None):
+        """Queue one input and wait for its result"""
+        return self.submit(x).result(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        batch = [(x, future) for x, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        self.batches += 1
+        self.requests += len(batch)
+        try:
+            results = self.predict_fn(np.stack([x for x, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+        }
+
+    def close(self):
+        """Flush what is queued and stop the worker thread"""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._thread = None
@@ -0,0 +1,153 @@
+"""
+Model Comparison Harness
+Fits candidate classifiers in parallel on one shared memory-mapped train/test split
+and reports speed and quality side by side
+"""
+
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from sklearn.metrics import accuracy_score, log_loss, roc_auc_score
+
+DEFAULT_REPORT = 'benchmark_report.json'
+SPLIT_ARRAYS = ('X_train', 'X_test', 'Y_train', 'Y_test')
+# Single-row predict calls timed per model (the serving case)
+SINGLE_ROW_SAMPLES = 50
+
+
+def share_split(directory, **arrays):
+    """Save the split as .npy files so every worker can memory-map the same pages"""
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+    return directory
+
+
+def load_split(directory):
+    """Memory-mapped (read-only) views of a split saved by share_split"""
+    return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+            for name in SPLIT_ARRAYS}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def evaluate_classifier(clf, split):
+    """
+    Fit one classifier and measure it
+
+    Returns:
+        dict: Classifier, fit_seconds, predict_ms_per_row (batch), single_row_ms (median),
+        peak_memory_mb (growth of the process peak RSS during fit/predict),
+        accuracy, log_loss, roc_auc
+    """
+    X_train, X_test = split['X_train'], split['X_test']
+    Y_train, Y_test = split['Y_train'], split['Y_test']
+    baseline_rss = _peak_rss_mb()
+
+    start = time.perf_counter()
+    clf.fit(X_train, Y_train)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    proba = clf.predict_proba(X_test)
+    predict_seconds = time.perf_counter() - start
+    predictions = clf.classes_[np.argmax(proba, axis=1)]
+
+    single = []
+    for row in X_test[:SINGLE_ROW_SAMPLES]:
+        start = time.perf_counter()
+        clf.predict_proba(row.reshape(1, -1))
+        single.append(time.perf_counter() - start)
+
+    positive = list(clf.classes_).index(1) if 1 in clf.classes_ else proba.shape[1] - 1
+    return {
+        'Classifier': clf.__class__.__name__,
+        'fit_seconds': fit_seconds,
+        'predict_ms_per_row': 1000 * predict_seconds / max(len(X_test), 1),
+        'single_row_ms': 1000 * float(np.median(single)) if single else None,
+        'peak_memory_mb': _peak_rss_mb() - baseline_rss,
+        'accuracy': float(accuracy_score(Y_test, predictions)),
+        'log_loss': float(log_loss(Y_test, proba, labels=clf.classes_)),
+        'roc_auc': float(roc_auc_score(Y_test, proba[:, positive])),
+    }
+
+
+def _benchmark_task(task):
+    clf, directory = task
+    try:
+        return evaluate_classifier(clf, load_split(directory))
+    except Exception as e:
+        return {'Classifier': clf.__class__.__name__, 'error': str(e)}
+
+
+def benchmark_classifiers(classifiers, X_train, X_test, Y_train, Y_test, n_jobs=None,
+                          report_path=DEFAULT_REPORT):
+    """
+    Fit and evaluate every classifier in parallel on one shared split
+
+    Each classifier runs in a fresh forked worker process (so peak memory is measured
+    per model) that memory-maps the split instead of receiving a pickled copy.
+
+    Args:
+        classifiers: Unfitted estimators exposing predict_proba
+        X_train, X_test, Y_train, Y_test: The split
+        n_jobs: Worker processes (default: CPU count; 1 runs in this process)
+        report_path: JSON report to write (None: no report)
+
+    Returns:
+        list of per-classifier result dicts, in input order
+    """
+    directory = tempfile.mkdtemp(prefix='sepsis_benchmark_')
+    try:
+        share_split(directory, X_train=X_train, X_test=X_test, Y_train=Y_train, Y_test=Y_test)
+        tasks = [(clf, directory) for clf in classifiers]
+        n_jobs = min(n_jobs or os.cpu_count() or 1, len(tasks))
+        if n_jobs > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            with multiprocessing.get_context('fork').Pool(n_jobs, maxtasksperchild=1) as pool:
+                results = pool.map(_benchmark_task, tasks, chunksize=1)
+        else:
+            results = [_benchmark_task(task) for task in tasks]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for result in results:
+        if 'error' in result:
+            print(f"[WARNING] {result['Classifier']} failed: {result['error']}")
+            continue
+        print("=" * 30)
+        print(result['Classifier'])
+        print('****Results****')
+        print(f"Accuracy: {result['accuracy']:.4%}")
+        print(f"Log Loss: {result['log_loss']}")
+        print(f"ROC-AUC: {result['roc_auc']:.4f}")
+        print(f"Fit: {result['fit_seconds']:.2f} s, predict: {result['predict_ms_per_row']:.4f} ms/row, "
+              f"single row: {result['single_row_ms']:.3f} ms, peak memory: +{result['peak_memory_mb']:.1f} MB")
+    print("=" * 30)
+
+    if report_path:
+        write_report(results, report_path, n_train=len(Y_train), n_test=len(Y_test),
+                     n_features=np.shape(X_train)[1])
+    return results
+
+
+def write_report(results, path, **metadata):
+    """Write the results as JSON (atomically)"""
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        **metadata,
+        'results': results,
+    }
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
+    print(f"✓ Benchmark report saved to: {path}")
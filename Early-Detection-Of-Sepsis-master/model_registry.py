@@ -0,0 +1,214 @@
+"""
+Model Registry
+Versioned manifest of the serving artifacts for each model phase
+"""
+
+import hashlib
+import os
+import pickle
+
+from inference import SepsisPredictor, DEFAULT_THRESHOLD
+from serving_memory import pack_estimator_arrays
+from trend_features import TREND_DEFINITION
+
+# Base features (27 features)
+BASE_FEATURES = [
+    'HR', 'O2Sat', 'Temp', 'SBP', 'MAP', 'DBP', 'Resp',
+    'BaseExcess', 'HCO3', 'FiO2', 'PaCO2', 'SaO2', 'Creatinine',
+    'Bilirubin_direct', 'Glucose', 'Lactate', 'Magnesium', 'Phosphate',
+    'Bilirubin_total', 'Hgb', 'WBC', 'Fibrinogen', 'Platelets',
+    'Age', 'Gender', 'HospAdmTime', 'ICULOS'
+]
+
+# Phase 2 trend features
+TREND_FEATURES = [
+    'HR_trend_1h', 'HR_volatility', 'O2Sat_trend_1h', 'O2Sat_volatility',
+    'Temp_trend_1h', 'Temp_volatility', 'Lactate_trend_1h', 'Lactate_volatility',
+    'SBP_trend_1h', 'SBP_volatility', 'Creatinine_trend_1h', 'Creatinine_volatility',
+    'WBC_trend_1h', 'WBC_volatility', 'Glucose_trend_1h', 'Glucose_volatility'
+]
+
+# Artifacts per phase; None marks an optional artifact the phase does not use
+MANIFEST = {
+    'calibrated': {
+        'label': 'Calibrated Random Forest',
+        'model': 'model_calibrated.pkl',
+        'scaler': 'scaler_calibrated.pkl',
+        'scaling_params': 'scaling_params.pkl',
+        'threshold_info': None,
+        'features': BASE_FEATURES,
+    },
+    'phase2': {
+        'label': 'Phase 2 MLP',
+        'model': 'model_phase2.pkl',
+        'scaler': 'scaler_phase2.pkl',
+        'scaling_params': None,
+        'threshold_info': 'threshold_info.pkl',
+        'features': BASE_FEATURES + TREND_FEATURES,
+    },
+    'phase1': {
+        'label': 'Phase 1 MLP',
+        'model': 'model.pkl',
+        'scaler': 'scaler.pkl',
+        'scaling_params': None,
+        'threshold_info': None,
+        'features': BASE_FEATURES,
+    },
+}
+
+# Preferred serving order, best model first
+SERVING_ORDER = ['calibrated', 'phase2', 'phase1']
+
+REQUIRED_ARTIFACTS = ('model', 'scaler')
+OPTIONAL_ARTIFACTS = ('scaling_params', 'threshold_info')
+
+
+class ModelRegistry:
+    """Resolves, validates and caches the artifacts of each model phase"""
+
+    def __init__(self, base_dir='.', manifest=MANIFEST, serving_order=SERVING_ORDER, pack_weights=True):
+        """
+        Args:
+            base_dir: Directory holding the artifact files
+            manifest: {phase: artifact spec} as in MANIFEST
+            serving_order: Phases to try when selecting the serving model
+            pack_weights: Move model/scaler weights into contiguous read-only buffers
+                so forked workers share them copy-on-write
+        """
+        self.base_dir = base_dir
+        self.pack_weights = pack_weights
+        self.manifest = manifest
+        self.serving_order = list(serving_order)
+        self.serving_phase = None
+        self._loaded = {}
+
+    def _path(self, filename):
+        return os.path.join(self.base_dir, filename)
+
+    def is_available(self, phase):
+        """True when every required artifact of the phase exists on disk"""
+        spec = self.manifest[phase]
+        return all(os.path.exists(self._path(spec[key])) for key in REQUIRED_ARTIFACTS)
+
+    def load(self, phase):
+        """
+        Load and validate a phase's artifacts (once; later calls hit the cache)
+
+        Only the requested phase is read from disk, so unused phases cost nothing.
+
+        Returns:
+            dict with model, scaler, scaling_params, threshold_info, features,
+            label, phase and version
+        Raises:
+            FileNotFoundError: a required artifact is missing
+            ValueError: an artifact does not match the manifest feature list
+        """
+        if phase in self._loaded:
+            return self._loaded[phase]
+
+        spec = self.manifest[phase]
+        artifacts = {'phase': phase, 'label': spec['label'], 'features': list(spec['features'])}
+        fingerprints = []
+        for key in REQUIRED_ARTIFACTS + OPTIONAL_ARTIFACTS:
+            filename = spec.get(key)
+            if filename is None or (key in OPTIONAL_ARTIFACTS and not os.path.exists(self._path(filename))):
+                artifacts[key] = None
+                continue
+            with open(self._path(filename), 'rb') as f:
+                data = f.read()
+            artifacts[key] = pickle.loads(data)
+            fingerprints.append(hashlib.sha256(data).hexdigest())
+
+        self._validate(phase, artifacts)
+        artifacts['packed_bytes'] = 0
+        if self.pack_weights:
+            for key in REQUIRED_ARTIFACTS:
+                artifacts['packed_bytes'] += pack_estimator_arrays(artifacts[key])
+        artifacts['version'] = f"{phase}-{hashlib.sha256(''.join(fingerprints).encode()).hexdigest()[:8]}"
+        self._loaded[phase] = artifacts
+        return artifacts
+
+    def _validate(self, phase, artifacts):
+        expected = len(artifacts['features'])
+        for key in REQUIRED_ARTIFACTS:
+            n_features = getattr(artifacts[key], 'n_features_in_', expected)
+            if n_features != expected:
+                raise ValueError(
+                    f"{self.manifest[phase][key]} expects {n_features} features, "
+                    f"manifest for '{phase}' lists {expected}"
+                )
+        # Trend features are computed online at serving time, so the model must have
+        # been trained on the same definition (recorded by train_model_phase2.py)
+        if set(TREND_FEATURES) & set(artifacts['features']):
+            info = artifacts['threshold_info'] or {}
+            if info.get('trend_definition') != TREND_DEFINITION:
+                raise ValueError(
+                    f"'{phase}' was not trained on the current trend features "
+                    f"(no matching trend_definition in threshold_info); retrain with train_model_phase2.py"
+                )
+
+    def select(self, available_features):
+        """
+        Pick the first phase in serving order that is on disk and only needs
+        features the caller can provide (checked from the manifest, before loading)
+        """
+        available = set(available_features)
+        for phase in self.serving_order:
+            if not self.is_available(phase):
+                continue
+            if not set(self.manifest[phase]['features']) <= available:
+                print(f"[INFO] {self.manifest[phase]['label']} requires features not available at serving time - skipping")
+                continue
+            try:
+                self.load(phase)
+            except (OSError, pickle.UnpicklingError, ValueError) as e:
+                print(f"[WARNING] Could not load {phase} artifacts: {e}")
+                continue
+            self.serving_phase = phase
+            return phase
+        raise FileNotFoundError("No servable model found in the registry")
+
+    def threshold(self, phase=None):
+        """Tuned decision threshold of a phase (threshold_info), else DEFAULT_THRESHOLD"""
+        info = self.load(phase or self.serving_phase)['threshold_info']
+        if info and info.get('optimal_threshold') is not None:
+            return float(info['optimal_threshold'])
+        return DEFAULT_THRESHOLD
+
+    def predictor(self, phase=None, threshold=None):
+        """
+        Build a SepsisPredictor for a loaded phase (default: the serving phase)
+
+        Args:
+            phase: Phase to serve
+            threshold: Decision threshold (default: the phase's tuned threshold)
+        """
+        artifacts = self.load(phase or self.serving_phase)
+        if threshold is None:
+            threshold = self.threshold(artifacts['phase'])
+        return SepsisPredictor(
+            artifacts['model'],
+            artifacts['scaler'],
+            artifacts['scaling_params'],
+            threshold=threshold,
+            version=artifacts['label']
+        )
+
+    def describe(self, phase=None):
+        """JSON-friendly summary of a phase (default: the serving phase)"""
+        phase = phase or self.serving_phase
+        spec = self.manifest[phase]
+        info = {
+            'phase': phase,
+            'label': spec['label'],
+            'n_features': len(spec['features']),
+            'artifacts': {key: spec[key] for key in REQUIRED_ARTIFACTS + OPTIONAL_ARTIFACTS if spec[key]},
+            'available': self.is_available(phase),
+            'loaded': phase in self._loaded,
+            'serving': phase == self.serving_phase,
+        }
+        if phase in self._loaded:
+            info['version'] = self._loaded[phase]['version']
+            info['packed_bytes'] = self._loaded[phase]['packed_bytes']
+            info['threshold'] = self.threshold(phase)
+        return info
@@ -0,0 +1,72 @@
+"""
+Phase 3 Streaming Input Pipeline
+tf.data datasets that build LSTM windows on the fly from the 2-D scaled feature matrix
+"""
+
+import numpy as np
+import tensorflow as tf
+
+# Shuffle buffer (in windows) when gathered windows are cached to disk
+CACHED_SHUFFLE_BUFFER = 10000
+
+
+def make_window_dataset(X_scaled, labels, starts, sequence_length=12, batch_size=32,
+                        shuffle=False, seed=None, cache_path=None):
+    """
+    Stream (windows, labels) batches for the given window start rows
+
+    Only the 2-D (rows, features) matrix is held in memory; each batch gathers
+    X_scaled[start:start + sequence_length] for its starts inside the pipeline.
+
+    Args:
+        X_scaled: (rows, features) scaled feature matrix
+        labels: Label per start row (as from forecast_labels), or None to yield windows only
+        starts: Window start rows making up this split (train, validation or test)
+        sequence_length: Timesteps per window
+        batch_size: Windows per batch
+        shuffle: Reshuffle the starts every epoch
+        seed: Shuffle seed
+        cache_path: Optional local file prefix; gathered windows are cached there
+            after the first epoch instead of being rebuilt
+
+    Returns:
+        tf.data.Dataset of (X_batch, y_batch) or X_batch
+    """
+    X_tensor = tf.constant(np.asarray(X_scaled, dtype=np.float32))
+    y_tensor = None if labels is None else tf.constant(np.asarray(labels, dtype=np.float32))
+    offsets = tf.range(sequence_length, dtype=tf.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+
+    def gather(start):
+        # start: scalar or (batch,) -> window rows (..., sequence_length)
+        rows = tf.expand_dims(start, -1) + offsets
+        windows = tf.gather(X_tensor, rows)
+        if y_tensor is None:
+            return windows
+        return windows, tf.gather(y_tensor, start)
+
+    ds = tf.data.Dataset.from_tensor_slices(starts)
+
+    if cache_path:
+        # Gather once per window, cache on local disk, shuffle the cached windows
+        ds = ds.map(gather, num_parallel_calls=tf.data.AUTOTUNE).cache(cache_path)
+        if shuffle:
+            ds = ds.shuffle(min(len(starts), CACHED_SHUFFLE_BUFFER), seed=seed,
+                            reshuffle_each_iteration=True)
+        ds = ds.batch(batch_size)
+    else:
+        # Shuffling start rows is cheap, so the whole split is shuffled every epoch
+        if shuffle:
+            ds = ds.shuffle(max(len(starts), 1), seed=seed, reshuffle_each_iteration=True)
+        ds = ds.batch(batch_size).map(gather, num_parallel_calls=tf.data.AUTOTUNE)
+
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+
+def split_starts(starts, validation_fraction):
+    """
+    Split start rows into (fit, validation) by index range: the validation set is
+    the last validation_fraction of the rows, as Keras validation_split did
+    """
+    n_val = int(len(starts) * validation_fraction)
+    return starts[:len(starts) - n_val], starts[len(starts) - n_val:]
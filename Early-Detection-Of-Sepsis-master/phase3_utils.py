@@ -3,9 +3,18 @@ Phase 3 Prediction Utility
 Handles LSTM predictions and integrates with Flask
 """
 
+import threading
+import time
+from collections import OrderedDict
+
+import os
+
 import numpy as np
 import pickle
-from tensorflow import keras
+
+from lstm_numpy import DEFAULT_EXPORT_PATH, NumpyLSTMModel
+from micro_batching import MAX_BATCH_SIZE, MAX_WAIT, MicroBatchScheduler
+from sequence_windows import last_window
 
 # Configuration
 SEQUENCE_LENGTH = 12
@@ -16,16 +25,38 @@ FEATURE_COLUMNS = [
     'Potassium', 'Hgb'
 ]
 
+# Batch sizes run once at startup so the first real request pays no tracing cost
+WARMUP_BATCH_SIZES = (1, MAX_BATCH_SIZE)
+
+# Streaming state: patients without an update for STALE_AFTER seconds are evicted,
+# and at most MAX_STREAMED_PATIENTS ring buffers are kept
+STALE_AFTER = 6 * 3600
+MAX_STREAMED_PATIENTS = 5000
+
 class Phase3LSTMPredictor:
     """LSTM model wrapper for time-series predictions"""
     
-    def __init__(self, model_path='model_phase3_lstm.h5', scaler_path='scaler_phase3.pkl'):
-        """Initialize Phase 3 LSTM model"""
+    def __init__(self, model_path='model_phase3_lstm.h5', scaler_path='scaler_phase3.pkl',
+                 export_path=DEFAULT_EXPORT_PATH):
+        """
+        Initialize Phase 3 LSTM model
+
+        The NumPy export (written by train_model_phase3_lstm.py) is used when present,
+        so TensorFlow is never imported; otherwise the Keras model is loaded.
+        """
+        self.scheduler = None
         try:
-            self.model = keras.models.load_model(model_path)
+            if export_path and os.path.exists(export_path):
+                self.model = NumpyLSTMModel(export_path)
+                self.backend = 'numpy'
+            else:
+                from tensorflow import keras
+                self.model = keras.models.load_model(model_path)
+                self.backend = 'keras'
+                self._compile_keras()
             self.scaler = pickle.load(open(scaler_path, 'rb'))
             self.ready = True
-            print("[INFO] Phase 3 LSTM model loaded successfully")
+            print(f"[INFO] Phase 3 LSTM model loaded successfully ({self.backend} backend)")
         except Exception as e:
             self.ready = False
             print(f"[WARNING] Phase 3 LSTM model not available: {e}")
@@ -35,24 +66,60 @@ class Phase3LSTMPredictor:
         Create a sequence from a list of feature vectors
         features_list: list of feature vectors [[f1, f2, ...], [f1, f2, ...], ...]
         """
-        if len(features_list) < SEQUENCE_LENGTH:
-            # Pad with the first sample if we don't have enough data
-            while len(features_list) < SEQUENCE_LENGTH:
-                features_list = [features_list[0]] + features_list
-        
-        # Take last SEQUENCE_LENGTH samples
-        sequence = np.array(features_list[-SEQUENCE_LENGTH:])
-        
-        # Reshape for scaler
-        n_samples, n_features = sequence.shape
-        sequence_flat = sequence.reshape(-1, n_features)
+        # Take last SEQUENCE_LENGTH samples, padding with the first sample if we don't have enough data
+        sequence = last_window(features_list, SEQUENCE_LENGTH)
+        n_features = sequence.shape[1]
         
         # Scale
-        sequence_scaled = self.scaler.transform(sequence_flat)
+        sequence_scaled = self.scaler.transform(sequence)
         sequence_scaled = sequence_scaled.reshape(1, SEQUENCE_LENGTH, n_features)
         
         return sequence_scaled
     
+    def _compile_keras(self):
+        """
+        Wrap the Keras model in a tf.function with a fixed [None, timesteps, features]
+        signature: traced once for every batch size, bypassing the predict() loop
+        """
+        import tensorflow as tf
+        
+        model = self.model
+        signature = [tf.TensorSpec([None] + list(model.input_shape[1:]), tf.float32)]
+        self._infer = tf.function(lambda x: model(x, training=False), input_signature=signature)
+    
+    def warmup(self, batch_sizes=WARMUP_BATCH_SIZES):
+        """Run inference on zero inputs so tracing and allocation happen at startup"""
+        if not self.ready:
+            return
+        n_features = self.scaler.n_features_in_
+        for batch_size in batch_sizes:
+            self.predict_scaled(np.zeros((batch_size, SEQUENCE_LENGTH, n_features), dtype=np.float32))
+    
+    def predict_scaled(self, sequences):
+        """
+        Probabilities for already-scaled (N, SEQUENCE_LENGTH, features) sequences
+
+        Returns:
+            (N,) array
+        """
+        if self.backend == 'numpy':
+            return self.model.predict(sequences)
+        return self._infer(np.asarray(sequences, dtype=np.float32)).numpy()[:, 0]
+    
+    def enable_batching(self, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT):
+        """
+        Route single-window predictions through a cross-patient micro-batching
+        scheduler: concurrent requests share one model call
+        """
+        self.scheduler = MicroBatchScheduler(self.predict_scaled, max_batch_size, max_wait)
+        return self.scheduler
+    
+    def predict_window(self, window):
+        """Probability for one scaled (SEQUENCE_LENGTH, features) window"""
+        if self.scheduler is not None:
+            return float(self.scheduler.predict(window))
+        return float(self.predict_scaled(window[None])[0])
+    
     def predict(self, features_history):
         """
         Predict sepsis probability from historical features
@@ -76,23 +143,130 @@ class Phase3LSTMPredictor:
             sequence = self.create_sequence(features_array)
             
             # Predict
-            prob = self.model.predict(sequence, verbose=0)[0][0]
-            return float(prob)
+            return self.predict_window(sequence[0])
         
         except Exception as e:
             print(f"[ERROR] Phase 3 prediction failed: {e}")
             return None
 
+class StreamingLSTMPredictor:
+    """
+    Per-patient streaming predictions for monitors that send one observation at a time
+
+    Each patient keeps a preallocated, already-scaled (SEQUENCE_LENGTH, features)
+    ring buffer. An update scales only the new row, writes it over the oldest
+    slot and scores the window, so its cost does not depend on history length.
+    Windows match Phase3LSTMPredictor.predict on the full history, including the
+    padding with the first observation for short stays.
+    """
+    
+    def __init__(self, predictor, stale_after=STALE_AFTER, max_patients=MAX_STREAMED_PATIENTS):
+        """
+        Args:
+            predictor: Loaded Phase3LSTMPredictor
+            stale_after: Seconds without an update before a patient is evicted
+            max_patients: Most patients kept (least recently updated are evicted first)
+        """
+        self.predictor = predictor
+        self.stale_after = stale_after
+        self.max_patients = max_patients
+        scaler = predictor.scaler
+        # StandardScaler is applied inline on the single new row; other scalers use transform
+        self._mean = getattr(scaler, 'mean_', None)
+        self._scale = getattr(scaler, 'scale_', None)
+        self._patients = OrderedDict()  # patient_id -> state dict, least recently updated first
+        self._lock = threading.Lock()
+    
+    def _scale_row(self, row):
+        if self._mean is not None and self._scale is not None:
+            return (row - self._mean) / self._scale
+        return self.predictor.scaler.transform(row.reshape(1, -1))[0]
+    
+    def _vector(self, features):
+        if isinstance(features, dict):
+            return np.array([features.get(col, 0) for col in FEATURE_COLUMNS], dtype=np.float64)
+        return np.asarray(features, dtype=np.float64)
+    
+    def _evict(self, now):
+        # Oldest updates sit at the front, so stale patients are popped from there
+        while self._patients:
+            patient_id, state = next(iter(self._patients.items()))
+            if len(self._patients) <= self.max_patients and now - state['updated'] <= self.stale_after:
+                break
+            self._patients.pop(patient_id)
+    
+    def push(self, patient_id, features):
+        """
+        Append one observation to a patient's window without scoring it
+
+        Returns:
+            (SEQUENCE_LENGTH, features) copy of the patient's scaled window, oldest row first
+        """
+        scaled = self._scale_row(self._vector(features))
+        now = time.monotonic()
+        with self._lock:
+            state = self._patients.pop(patient_id, None)
+            if state is None:
+                # First observation fills the whole window (front padding)
+                buffer = np.empty((SEQUENCE_LENGTH, len(scaled)), dtype=np.float32)
+                buffer[:] = scaled
+                state = {'buffer': buffer, 'position': 0, 'count': 1}
+            else:
+                state['buffer'][state['position']] = scaled
+                state['position'] = (state['position'] + 1) % SEQUENCE_LENGTH
+                state['count'] += 1
+            state['updated'] = now
+            self._patients[patient_id] = state
+            self._evict(now)
+            position = state['position']
+            return np.concatenate((state['buffer'][position:], state['buffer'][:position]))
+    
+    def update(self, patient_id, features):
+        """
+        Add one observation (feature dict or vector) and predict for the patient
+
+        Returns:
+            probability (0-1), or None when the model is unavailable
+        """
+        if not self.predictor.ready:
+            return None
+        try:
+            window = self.push(patient_id, features)
+            return self.predictor.predict_window(window)
+        except Exception as e:
+            print(f"[ERROR] Phase 3 streaming prediction failed: {e}")
+            return None
+    
+    def observations(self, patient_id):
+        """Observations received for a patient (0 when unknown or evicted)"""
+        with self._lock:
+            state = self._patients.get(patient_id)
+            return 0 if state is None else state['count']
+    
+    def discharge(self, patient_id):
+        """Drop a patient's state"""
+        with self._lock:
+            self._patients.pop(patient_id, None)
+    
+    def __len__(self):
+        return len(self._patients)
+
 # ============================================================================
 # Initialization for Flask
 # ============================================================================
 
 phase3_predictor = None
+phase3_stream = None
 
 def initialize_phase3():
     """Initialize Phase 3 model (called on Flask startup)"""
-    global phase3_predictor
+    global phase3_predictor, phase3_stream
     try:
         phase3_predictor = Phase3LSTMPredictor()
+        if phase3_predictor.ready:
+            phase3_predictor.enable_batching()
+            phase3_predictor.warmup()
+        phase3_stream = StreamingLSTMPredictor(phase3_predictor) if phase3_predictor.ready else None
     except:
         phase3_predictor = None
+        phase3_stream = None
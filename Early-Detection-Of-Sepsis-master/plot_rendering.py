@@ -0,0 +1,169 @@
+"""
+Explanation Plot Rendering
+Thread-safe bar-chart rendering (PNG, SVG or JSON) on a worker pool, with a
+content-addressed image cache
+"""
+
+import base64
+import hashlib
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from explanation_cache import ExplanationCache
+
+FORMATS = ('png', 'svg', 'json')
+
+BACKGROUND_COLOR = '#0a0e27'
+PANEL_COLOR = '#1a1f3a'
+ACCENT_COLOR = '#ffd700'
+NEGATIVE_COLOR = '#ff6b6b'
+TICK_COLOR = '#b0b0b0'
+
+RENDER_WORKERS = 2
+IMAGE_CACHE_BYTES = 32 * 1024 * 1024
+# Values are rounded to this many decimals before hashing, so identical-looking
+# charts share one cached image
+KEY_DECIMALS = 6
+
+
+def bar_color(value):
+    return ACCENT_COLOR if value > 0 else NEGATIVE_COLOR
+
+
+def render_png(labels, values, title, xlabel):
+    """
+    Horizontal bar chart as a base64 PNG
+
+    Uses a standalone Figure with its own Agg canvas instead of pyplot, so no
+    global matplotlib state is touched and renders can run concurrently.
+    """
+    fig = Figure(figsize=(10, 6), facecolor=BACKGROUND_COLOR)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_facecolor(PANEL_COLOR)
+
+    ax.barh(labels, values, color=[bar_color(v) for v in values],
+            edgecolor=ACCENT_COLOR, linewidth=1.5)
+
+    ax.set_xlabel(xlabel, color=ACCENT_COLOR, fontsize=12, fontweight='bold')
+    ax.set_ylabel('Features', color=ACCENT_COLOR, fontsize=12, fontweight='bold')
+    ax.set_title(title, color=ACCENT_COLOR, fontsize=14, fontweight='bold')
+    ax.tick_params(colors=TICK_COLOR)
+    ax.spines['bottom'].set_color(ACCENT_COLOR)
+    ax.spines['left'].set_color(ACCENT_COLOR)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', facecolor=BACKGROUND_COLOR, edgecolor='none')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def render_svg(labels, values, title, xlabel, width=800, row_height=32):
+    """Horizontal bar chart as standalone SVG markup, built without matplotlib"""
+    label_width, margin, header = 260, 20, 50
+    plot_width = width - label_width - 2 * margin
+    height = header + row_height * len(values) + 50
+    extent = max((abs(v) for v in values), default=0) or 1.0
+    zero_x = label_width + margin + plot_width / 2
+    scale = plot_width / 2 / extent
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif">',
+        f'<rect width="100%" height="100%" fill="{BACKGROUND_COLOR}"/>',
+        f'<text x="{width / 2}" y="30" text-anchor="middle" fill="{ACCENT_COLOR}" '
+        f'font-size="16" font-weight="bold">{escape(title)}</text>',
+    ]
+    # Largest contribution on top, as in the PNG (barh draws the last bar on top)
+    for row, (label, value) in enumerate(zip(reversed(labels), reversed(values))):
+        y = header + row * row_height
+        bar_x = zero_x if value >= 0 else zero_x + value * scale
+        parts.append(
+            f'<text x="{label_width}" y="{y + row_height * 0.6}" text-anchor="end" '
+            f'fill="{TICK_COLOR}" font-size="12">{escape(str(label))}</text>'
+            f'<rect x="{bar_x:.1f}" y="{y + 4}" width="{abs(value) * scale:.1f}" '
+            f'height="{row_height - 8}" fill="{bar_color(value)}" stroke="{ACCENT_COLOR}"/>'
+        )
+    axis_bottom = header + row_height * len(values)
+    parts.append(
+        f'<line x1="{zero_x}" y1="{header}" x2="{zero_x}" y2="{axis_bottom}" stroke="{ACCENT_COLOR}"/>'
+        f'<text x="{zero_x}" y="{axis_bottom + 30}" text-anchor="middle" fill="{ACCENT_COLOR}" '
+        f'font-size="13" font-weight="bold">{escape(xlabel)}</text>'
+    )
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def render_json(labels, values, title, xlabel):
+    """Chart description for client-side rendering"""
+    return {
+        'title': title,
+        'xlabel': xlabel,
+        'bars': [{'label': str(label), 'value': float(value), 'color': bar_color(value)}
+                 for label, value in zip(labels, values)],
+    }
+
+
+RENDERERS = {'png': render_png, 'svg': render_svg, 'json': render_json}
+
+
+def chart_key(fmt, labels, values, title, xlabel):
+    """Content address of a chart: hash of everything that changes its pixels"""
+    content = [fmt, title, xlabel, [str(label) for label in labels],
+               [round(float(v), KEY_DECIMALS) for v in values]]
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+
+class PlotRenderer:
+    """Renders bar charts on a thread pool, caching each image by its content"""
+
+    def __init__(self, max_workers=RENDER_WORKERS, cache=None):
+        """
+        Args:
+            max_workers: Render threads
+            cache: ExplanationCache used as the image store (default: a new
+                IMAGE_CACHE_BYTES cache without expiry; False disables caching)
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='plot-render')
+        if cache is None:
+            cache = ExplanationCache(max_bytes=IMAGE_CACHE_BYTES, ttl=None)
+        self.cache = None if cache is False else cache
+
+    def submit(self, labels, values, title, xlabel, fmt='png'):
+        """
+        Queue a chart for rendering
+
+        Returns:
+            Future resolving to a base64 PNG string, SVG markup or a JSON dict
+            (already resolved on a cache hit)
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown plot format: {fmt}")
+        labels, values = list(labels), [float(v) for v in values]
+        key = chart_key(fmt, labels, values, title, xlabel)
+        cached = None if self.cache is None else self.cache.get(key)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        future = self.executor.submit(RENDERERS[fmt], labels, values, title, xlabel)
+        if self.cache is not None:
+            def store(done):
+                if done.exception() is None:
+                    self.cache.put(key, done.result())
+            future.add_done_callback(store)
+        return future
+
+    def render(self, labels, values, title, xlabel, fmt='png', timeout=None):
+        """Render a chart and wait for the result"""
+        return self.submit(labels, values, title, xlabel, fmt).result(timeout)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -1,196 +1,36 @@
 #!/usr/bin/env python
 # coding: utf-8
-
-# In[1]:
-
+# Classifier comparison on the upsampled 40-column split
+# Runs the 'benchmark' training_pipeline preset: all candidates are fitted in parallel
+# on one shared split and the numbers are written to benchmark_report.json
 
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
-from sklearn import preprocessing
-from sklearn.model_selection import train_test_split
-from sklearn.neural_network import MLPClassifier
-
-
-# In[2]:
-
-
-dataset = pd.read_csv("sepsis.csv")
-
-
-# In[3]:
-
-
-dataset['SepsisLabel'].value_counts()
-
-
-# In[4]:
-
-
-plt.pie(dataset['SepsisLabel'].value_counts(), labels=['0','1'], autopct='%1.1f%%', shadow=True)
-plt.show()
-sns.countplot(dataset['SepsisLabel'], label="Count")
-plt.show()
-
-
-# In[5]:
-
-
-from sklearn.utils import resample
-df_majority = dataset[dataset.SepsisLabel==0]
-df_minority = dataset[dataset.SepsisLabel==1]
-
-
-# In[6]:
-
-
-df_minority_upsampled = resample(df_minority, 
-                                 replace=True,     # sample with replacement
-                                 n_samples=37945,    # to match majority class
-                                 random_state=123) # reproducible results
-
-
-# In[7]:
-
-
-df_upsampled = pd.concat([df_majority, df_minority_upsampled])
-
-
-# In[8]:
-
-
-df_upsampled.SepsisLabel.value_counts()
-
-
-# In[9]:
-
-
-plt.pie(df_upsampled['SepsisLabel'].value_counts(), labels=['1','0'], autopct='%1.1f%%', shadow=True)
-plt.show()
-sns.countplot(df_upsampled['SepsisLabel'], label="Count")
-plt.show()
-
-
-# In[10]:
-
-
-X = df_upsampled[df_upsampled.columns[0:40]].values
-
 
-# In[11]:
+from training_pipeline import preset, run_pipeline
 
+run = run_pipeline(preset('benchmark'))
+results = run['results']
 
-Y = df_upsampled[df_upsampled.columns[40:]].values
-
-
-# In[12]:
-
-
-print("sca dimensions : {}".format(df_upsampled.shape))
-
-
-# In[13]:
-
-
-print("sca dimensions : {}".format(X.shape))
-
-
-# In[14]:
-
-
-print("sca dimensions : {}".format(Y.shape))
-
-
-# In[15]:
-
-
-a = df_upsampled.isnull().sum()
-
-
-# In[16]:
-
-
-b = df_upsampled.isna().sum()
-
-
-# In[17]:
-
-
-labelencoder_Y = preprocessing.LabelEncoder()
-Y = labelencoder_Y.fit_transform(Y)
-
-
-# In[18]:
-
-
-X_train, X_test, Y_train, Y_test = train_test_split(X, Y, test_size=0.20, random_state=0)
-print("Training data dimensions :{}".format(X_train.shape))
-print("Testing data dimensions :{}".format(X_test.shape))
-
-
-# In[23]:
-
-
-from sklearn.metrics import accuracy_score, log_loss
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.svm import SVC, LinearSVC, NuSVC
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier, AdaBoostClassifier, GradientBoostingClassifier
-from sklearn.naive_bayes import GaussianNB
-from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
-from sklearn.discriminant_analysis import QuadraticDiscriminantAnalysis
-from sklearn.neural_network import MLPClassifier
-classifiers = [
-    #KNeighborsClassifier(3),
-    #SVC(kernel="rbf", C=0.025, probability=True),
-    #NuSVC(probability=True),
-    #DecisionTreeClassifier(),
-    #RandomForestClassifier(),
-    MLPClassifier(
-    activation='tanh',
-    solver='lbfgs',
-    early_stopping=False,
-    hidden_layer_sizes=(40,10,10,10,10, 2),
-    random_state=1,
-    batch_size='auto',
-    max_iter=13000,
-    learning_rate_init=1e-5,
-    tol=1e-4,
-),
-    AdaBoostClassifier(),
-    GradientBoostingClassifier(),
-    GaussianNB(),
-    LinearDiscriminantAnalysis(),
-    QuadraticDiscriminantAnalysis()]
+# Class balance before and after upsampling, from the cached label column and the
+# balance stage's row index
+labels = pd.Series(run['labels'], name='SepsisLabel')
+for title, counts in (('Before upsampling', labels), ('After upsampling', labels.iloc[run['balanced_index']])):
+    print(f"{title}: {counts.value_counts().to_dict()}")
+    value_counts = counts.value_counts().sort_index()
+    plt.pie(value_counts, labels=[str(v) for v in value_counts.index], autopct='%1.1f%%', shadow=True)
+    plt.title(title)
+    plt.show()
+    sns.countplot(x=counts, label="Count")
+    plt.title(title)
+    plt.show()
 
 # Logging for Visual Comparison
-log_cols=["Classifier", "Accuracy", "Log Loss"]
-log = pd.DataFrame(columns=log_cols)
-
-for clf in classifiers:
-    clf.fit(X_train, Y_train)
-    name = clf.__class__.__name__
-    
-    print("="*30)
-    print(name)
-    
-    print('****Results****')
-    train_predictions = clf.predict(X_test)
-    acc = accuracy_score(Y_test, train_predictions)
-    print("Accuracy: {:.4%}".format(acc))
-    
-    train_predictions = clf.predict_proba(X_test)
-    ll = log_loss(Y_test, train_predictions)
-    print("Log Loss: {}".format(ll))
-    
-    log_entry = pd.DataFrame([[name, acc*100, ll]], columns=log_cols)
-    log = log.append(log_entry)
-    
-print("="*30)
-
-
-# In[24]:
-
+log = pd.DataFrame([
+    {'Classifier': r['Classifier'], 'Accuracy': r['accuracy'] * 100, 'Log Loss': r['log_loss']}
+    for r in results if 'error' not in r
+])
 
 sns.set_color_codes("muted")
 sns.barplot(x='Accuracy', y='Classifier', data=log, color="b")
@@ -205,10 +45,3 @@ sns.barplot(x='Log Loss', y='Classifier', data=log, color="g")
 plt.xlabel('Log Loss')
 plt.title('Classifier Log Loss')
 plt.show()
-
-
-# In[ ]:
-
-
-
-
@@ -0,0 +1,137 @@
+"""
+Sequence Windowing for the Phase 3 LSTM
+Zero-copy sliding windows over a 2-D feature matrix and vectorized forecast labels
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Column identifying the ICU stay each row belongs to (when present in the dataset)
+PATIENT_ID_COLUMN = 'Patient_ID'
+
+
+def window_view(X, sequence_length, n_windows=None):
+    """
+    Strided (n_windows, sequence_length, n_features) view over a 2-D matrix
+
+    window_view(X, L)[i] is X[i:i + L]; no data is copied.
+    """
+    X = np.asarray(X)
+    windows = sliding_window_view(X, sequence_length, axis=0).transpose(0, 2, 1)
+    return windows if n_windows is None else windows[:n_windows]
+
+
+def forecast_labels(y, sequence_length, forecast_steps):
+    """
+    Binary target for every window: mean of the next forecast_steps labels > 0.5
+
+    Uses a cumulative sum so each label is an O(1) difference instead of a
+    separate np.mean over a slice.
+    """
+    y = np.asarray(y, dtype=np.int64)
+    n_windows = len(y) - sequence_length - forecast_steps + 1
+    if n_windows <= 0:
+        return np.zeros(0, dtype=np.int64)
+    cumulative = np.concatenate(([0], np.cumsum(y)))
+    start = np.arange(n_windows) + sequence_length
+    future_sum = cumulative[start + forecast_steps] - cumulative[start]
+    # mean > 0.5  <=>  2 * sum > forecast_steps (exact in integers)
+    return (2 * future_sum > forecast_steps).astype(np.int64)
+
+
+def last_window(rows, sequence_length):
+    """
+    Last sequence_length rows of a history, padding the front with the first row
+
+    Replaces repeated list prepending with a single index gather.
+    """
+    rows = np.asarray(rows)
+    index = np.clip(np.arange(len(rows) - sequence_length, len(rows)), 0, None)
+    return rows[index]
+
+
+def patient_ids(df, id_column=PATIENT_ID_COLUMN):
+    """
+    Patient identifier for every row of the dataset
+
+    Uses id_column when the dataset has it. Otherwise a new stay is assumed
+    wherever ICULOS (hours since ICU admission) fails to increase.
+    """
+    if id_column in df.columns:
+        return df[id_column].values
+    iculos = df['ICULOS'].values
+    new_stay = np.concatenate(([True], np.diff(iculos) <= 0))
+    return np.cumsum(new_stay) - 1
+
+
+def group_offsets(ids):
+    """
+    Row offsets of each patient's block: patient k spans rows offsets[k]:offsets[k + 1]
+
+    Raises:
+        ValueError: the rows of a patient are not contiguous
+    """
+    ids = np.asarray(ids)
+    if len(ids) == 0:
+        return np.zeros(1, dtype=np.int64)
+    change = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+    if len(change) + 1 != len(np.unique(ids)):
+        raise ValueError("Rows of each patient must be contiguous; sort by patient first")
+    return np.concatenate(([0], change, [len(ids)])).astype(np.int64)
+
+
+def grouped_fill(df, columns, ids):
+    """
+    Forward fill then backward fill within each patient, then fill any column
+    that is empty for a whole stay with the global mean
+    """
+    grouped = df[columns].groupby(ids, sort=False)
+    filled = grouped.ffill()
+    filled = filled.groupby(ids, sort=False).bfill()
+    return filled.fillna(df[columns].mean())
+
+
+class PatientWindowIndex:
+    """(patient, start) index of every window that stays inside one patient's stay"""
+
+    def __init__(self, ids, sequence_length=12, forecast_steps=6):
+        """
+        Args:
+            ids: Patient identifier per row (rows grouped contiguously per patient)
+            sequence_length: Input timesteps per window
+            forecast_steps: Future labels each window must still see in the same stay
+        """
+        self.offsets = group_offsets(ids)
+        self.sequence_length = sequence_length
+        self.forecast_steps = forecast_steps
+
+        lengths = np.diff(self.offsets)
+        counts = np.maximum(lengths - sequence_length - forecast_steps + 1, 0)
+        self.patient = np.repeat(np.arange(len(lengths)), counts)
+        # start = patient offset + position inside the patient's run of windows
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        self.start = np.repeat(self.offsets[:-1], counts) + within
+
+    def __len__(self):
+        return len(self.start)
+
+    @property
+    def n_patients(self):
+        return len(self.offsets) - 1
+
+    def pairs(self):
+        """(n_windows, 2) array of (patient, start row) pairs"""
+        return np.column_stack((self.patient, self.start))
+
+    def shard(self, shard, n_shards):
+        """Start rows of one shard; whole patients stay together in a shard"""
+        return self.start[self.patient % n_shards == shard]
+
+    def shuffled(self, seed=None):
+        """Start rows in random order"""
+        return np.random.default_rng(seed).permutation(self.start)
+
+    def window(self, X, position):
+        """Build one window on demand for the position-th (patient, start) pair"""
+        start = self.start[position]
+        return X[start:start + self.sequence_length]
@@ -0,0 +1,101 @@
+"""
+Serving Memory Utilities
+Keeps preloaded model weights shareable across forked gunicorn workers
+"""
+
+import gc
+import os
+
+import numpy as np
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def _is_float_array(value):
+    return isinstance(value, np.ndarray) and value.dtype.kind == 'f'
+
+
+def pack_estimator_arrays(estimator):
+    """
+    Move every float array attribute of a fitted estimator into contiguous buffers
+
+    Covers MLP coefs_/intercepts_, scaler mean_/var_/scale_ and linear coef_/intercept_.
+    The attributes are replaced by read-only views (one buffer per dtype), so after a
+    fork the weights sit in pages that no worker ever writes to. Tree ensembles keep
+    their node arrays inside Cython objects and are left untouched.
+
+    Returns:
+        int: number of bytes packed (0 when nothing was packable)
+    """
+    # name -> list of arrays, for plain arrays and lists of arrays (e.g. coefs_)
+    attributes = {}
+    for name, value in vars(estimator).items():
+        if _is_float_array(value):
+            attributes[name] = [value]
+        elif isinstance(value, (list, tuple)) and value and all(_is_float_array(v) for v in value):
+            attributes[name] = list(value)
+
+    by_dtype = {}
+    for arrays in attributes.values():
+        for array in arrays:
+            by_dtype.setdefault(array.dtype, []).append(array)
+
+    views = {}
+    packed = 0
+    for dtype, arrays in by_dtype.items():
+        buffer = np.empty(sum(a.size for a in arrays), dtype=dtype)
+        offset = 0
+        for array in arrays:
+            view = buffer[offset:offset + array.size].reshape(array.shape)
+            view[...] = array
+            view.flags.writeable = False
+            views[id(array)] = view
+            offset += array.size
+        buffer.flags.writeable = False
+        packed += buffer.nbytes
+
+    for name, arrays in attributes.items():
+        value = getattr(estimator, name)
+        if isinstance(value, np.ndarray):
+            setattr(estimator, name, views[id(value)])
+        else:
+            setattr(estimator, name, type(value)(views[id(a)] for a in arrays))
+
+    return packed
+
+
+def freeze_after_load():
+    """
+    Move every object allocated so far into the GC's permanent generation
+
+    Call once in the master after the models are loaded and before forking.
+    Collections in the workers then skip these objects, so their headers are
+    not rewritten and the pages stay shared copy-on-write.
+    """
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+        return gc.get_freeze_count()
+    return 0
+
+
+def memory_report(pid='self'):
+    """
+    Read a process's memory breakdown from /proc/<pid>/smaps_rollup
+
+    Returns:
+        dict of MB values (rss, pss, shared_*, private_*, private_total), or None
+        when smaps_rollup is unavailable (non-Linux hosts)
+    """
+    path = f'/proc/{pid}/smaps_rollup'
+    if not os.path.exists(path):
+        return None
+
+    report = {}
+    with open(path) as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in SMAPS_FIELDS:
+                report[key.lower()] = int(rest.split()[0]) / 1024
+    report['private_total'] = report.get('private_clean', 0) + report.get('private_dirty', 0)
+    return report
@@ -0,0 +1,50 @@
+"""
+Parity test for the NumPy export of the Phase 3 LSTM
+Builds a small untrained model with the same layer chain as train_model_phase3_lstm.py,
+exports it and compares NumpyLSTMModel.predict with Keras
+"""
+
+import numpy as np
+import pytest
+
+keras = pytest.importorskip('tensorflow').keras
+layers = keras.layers
+
+from lstm_numpy import PARITY_TOLERANCE, NumpyLSTMModel, check_export_parity, export_lstm_model
+
+SEQUENCE_LENGTH = 12
+N_FEATURES = 27
+
+
+def build_model(seed=0):
+    """Phase 3 architecture with smaller layers"""
+    keras.utils.set_random_seed(seed)
+    inputs = keras.Input(shape=(SEQUENCE_LENGTH, N_FEATURES))
+    x = layers.Bidirectional(layers.LSTM(8, return_sequences=True, dropout=0.2, recurrent_dropout=0.2))(inputs)
+    attention = layers.MultiHeadAttention(num_heads=2, key_dim=4)(x, x)
+    x = layers.Add()([x, attention])
+    x = layers.LayerNormalization()(x)
+    x = layers.Bidirectional(layers.LSTM(4, return_sequences=False, dropout=0.2, recurrent_dropout=0.2))(x)
+    x = layers.Dense(8, activation='relu')(x)
+    x = layers.Dropout(0.3)(x)
+    outputs = layers.Dense(1, activation='sigmoid')(x)
+    return keras.Model(inputs=inputs, outputs=outputs)
+
+
+def test_export_matches_keras(tmp_path):
+    model = build_model()
+    X = np.random.default_rng(0).normal(size=(16, SEQUENCE_LENGTH, N_FEATURES)).astype(np.float32)
+
+    path = export_lstm_model(model, str(tmp_path / 'model.npz'))
+    numpy_model = NumpyLSTMModel(path)
+
+    assert numpy_model.predict(X).shape == (len(X),)
+    assert check_export_parity(model, numpy_model, X) <= PARITY_TOLERANCE
+
+
+def test_parity_check_rejects_other_weights(tmp_path):
+    X = np.random.default_rng(1).normal(size=(8, SEQUENCE_LENGTH, N_FEATURES)).astype(np.float32)
+    path = export_lstm_model(build_model(seed=1), str(tmp_path / 'other.npz'))
+
+    with pytest.raises(ValueError):
+        check_export_parity(build_model(seed=2), NumpyLSTMModel(path), X)
@@ -0,0 +1,54 @@
+"""
+Tests for the per-patient window index used by the Phase 3 LSTM
+"""
+
+import numpy as np
+
+from sequence_windows import PatientWindowIndex
+
+SEQUENCE_LENGTH = 4
+FORECAST_STEPS = 2
+
+
+def make_ids():
+    # Stays of 10, 3 (too short for a window), 7 and 6 hours
+    return np.repeat([11, 12, 13, 14], [10, 3, 7, 6])
+
+
+def test_windows_stay_inside_one_patient():
+    ids = make_ids()
+    index = PatientWindowIndex(ids, SEQUENCE_LENGTH, FORECAST_STEPS)
+    X = np.arange(len(ids))
+
+    for position, (patient, start) in enumerate(index.pairs()):
+        # The window and its forecast rows all belong to the same stay
+        span = ids[start:start + SEQUENCE_LENGTH + FORECAST_STEPS]
+        assert len(span) == SEQUENCE_LENGTH + FORECAST_STEPS
+        assert np.all(span == ids[index.offsets[patient]])
+        np.testing.assert_array_equal(index.window(X, position), X[start:start + SEQUENCE_LENGTH])
+
+    lengths = np.bincount(np.unique(ids, return_inverse=True)[1])
+    assert len(index) == np.maximum(lengths - SEQUENCE_LENGTH - FORECAST_STEPS + 1, 0).sum()
+
+
+def test_shards_are_disjoint_and_cover_every_window():
+    index = PatientWindowIndex(make_ids(), SEQUENCE_LENGTH, FORECAST_STEPS)
+    patient_of = dict(zip(index.start, index.patient))
+    n_shards = 3
+
+    shards = [index.shard(k, n_shards) for k in range(n_shards)]
+    combined = np.concatenate(shards)
+    assert len(combined) == len(np.unique(combined))
+    np.testing.assert_array_equal(np.sort(combined), np.sort(index.start))
+
+    # Every patient's windows land in exactly one shard
+    owners = {}
+    for k, starts in enumerate(shards):
+        for start in starts:
+            assert owners.setdefault(patient_of[start], k) == k
+
+
+def test_shuffled_is_a_seeded_permutation():
+    index = PatientWindowIndex(make_ids(), SEQUENCE_LENGTH, FORECAST_STEPS)
+    np.testing.assert_array_equal(np.sort(index.shuffled(seed=0)), index.start)
+    np.testing.assert_array_equal(index.shuffled(seed=0), index.shuffled(seed=0))
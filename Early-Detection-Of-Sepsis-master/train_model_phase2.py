@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# Phase 2 OPTIMIZATION - Trend features, cross-validation, threshold tuning
+# Rebuilds model_phase2.pkl, scaler_phase2.pkl and threshold_info.pkl (served through model_registry)
+
+import pickle
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.neural_network import MLPClassifier
+from sklearn.metrics import confusion_matrix, precision_recall_curve, roc_curve
+import warnings
+
+from data_cache import dataset_columns, load_dataset
+from balanced_sampling import BalancedSampler
+from model_registry import BASE_FEATURES, TREND_FEATURES
+from sequence_windows import PATIENT_ID_COLUMN, patient_ids
+from trend_features import TREND_DEFINITION, add_trend_features
+from cross_validation import (N_SPLITS, cross_val_predictions, fold_metrics, optimal_threshold,
+                              threshold_metrics, threshold_sweep)
+
+warnings.filterwarnings('ignore')
+
+# Cross-validation worker processes (None: one per CPU, up to N_SPLITS)
+CV_JOBS = None
+# 'youden' (sensitivity + specificity - 1) or 'f1'
+THRESHOLD_METRIC = 'youden'
+CV_METRICS = ['accuracy', 'precision', 'recall', 'f1', 'roc_auc']
+
+
+print("=" * 80)
+print("PHASE 2 OPTIMIZATION - Trend Features, Cross-Validation, Threshold Tuning")
+print("=" * 80)
+
+print("\n[1/10] Loading dataset...")
+columns = BASE_FEATURES + ['SepsisLabel']
+if PATIENT_ID_COLUMN in dataset_columns('sepsis.csv'):
+    columns.append(PATIENT_ID_COLUMN)
+df = load_dataset('sepsis.csv', columns=columns)
+print(f"✓ Dataset loaded: {len(df)} rows, {len(dataset_columns('sepsis.csv'))} columns")
+
+print("\n[2/10] Selecting 27 base features...")
+# Trends are computed along each stay, so rows are grouped by patient first
+ids = patient_ids(df)
+if PATIENT_ID_COLUMN in df.columns:
+    order = np.argsort(ids, kind='stable')
+    df = df.iloc[order].reset_index(drop=True)
+    ids = ids[order]
+print(f"✓ Selected {len(BASE_FEATURES)} features")
+
+print("\n[3/10] IMPROVEMENT 2.1 - Extracting trend features...")
+df = add_trend_features(df, ids)
+feature_cols = BASE_FEATURES + TREND_FEATURES
+print(f"✓ Added {len(TREND_FEATURES)} trend features")
+print(f"✓ Total features: {len(feature_cols)} ({len(BASE_FEATURES)} base + {len(TREND_FEATURES)} trend)")
+
+print("\n[4/10] Splitting train/test sets...")
+# Split the original rows first: upsampled copies of a row must never land on both sides
+Y = df['SepsisLabel'].values.astype(int)
+X = df[feature_cols].values
+train_rows, test_rows = train_test_split(np.arange(len(Y)), test_size=0.20, stratify=Y,
+                                         random_state=0)
+print(f"✓ Train set: {len(train_rows)} rows")
+print(f"✓ Test set: {len(test_rows)} rows (original class balance)")
+
+print("\n[5/10] Balancing the training rows...")
+sampler = BalancedSampler(Y[train_rows], random_state=123)
+print(f"  • Majority (No Sepsis): {len(sampler.majority)} samples")
+print(f"  • Minority (Sepsis): {len(sampler.minority)} samples")
+idx_train = train_rows[sampler.indices()]
+X_train, X_test = X[idx_train], X[test_rows]
+Y_train, Y_test = Y[idx_train], Y[test_rows]
+print(f"✓ After upsampling: {len(idx_train)} training samples (50-50)")
+
+print("\n[6/10] Normalizing features...")
+scaler = StandardScaler()
+X_train = scaler.fit_transform(X_train)
+X_test = scaler.transform(X_test)
+# Original (not upsampled) training rows, for cross-validation
+X_rows, Y_rows = scaler.transform(X[train_rows]), Y[train_rows]
+print("✓ Features normalized")
+
+print("\n[7/10] Training configuration...")
+model = MLPClassifier(
+    activation='relu',
+    solver='adam',
+    early_stopping=True,
+    validation_fraction=0.1,
+    n_iter_no_change=50,
+    hidden_layer_sizes=(128, 64, 32, 16, 8, 2),
+    random_state=1,
+    batch_size='auto',
+    max_iter=30000,
+    learning_rate='adaptive',
+    learning_rate_init=1e-4,
+    tol=1e-4
+)
+print(f"  • Input: {len(feature_cols)} features")
+print("  • Architecture: 128-64-32-16-8-2")
+print("  • Activation: relu, Solver: adam")
+
+print(f"\n[8/10] Cross-Validation ({N_SPLITS}-Fold, parallel)...")
+# Folds are split on the original training rows and upsampled inside each training
+# fold, so held-out rows and their copies are never fitted. Folds run in forked
+# workers; their predictions are cached by data and parameters, so reruns
+# (e.g. another THRESHOLD_METRIC) skip the fits
+cv = cross_val_predictions(model, X_rows, Y_rows, n_splits=N_SPLITS, random_state=0,
+                           n_jobs=CV_JOBS, upsample=True)
+print(f"  • Folds fitted: {N_SPLITS - cv['cached']}, reused from cache: {cv['cached']}")
+if cv['cached'] < N_SPLITS:
+    print(f"  • Fold fit time: {sum(cv['fit_seconds']):.1f} s total")
+cv_scores = fold_metrics(Y_rows, cv['proba'], cv['fold'])
+print("\nCV Results:")
+for name in CV_METRICS:
+    print(f"  {name.upper()}: {np.nanmean(cv_scores[name]):.4f} +/- {np.nanstd(cv_scores[name]):.4f}")
+
+print("\n  Training final model on the full train set...")
+model.fit(X_train, Y_train)
+print("✓ Training complete")
+
+print("\n[9/10] Threshold Tuning...")
+# Tuned on the out-of-fold predictions, so the test set stays untouched until evaluation
+best = optimal_threshold(Y_rows, cv['proba'], metric=THRESHOLD_METRIC)
+oof_auc = threshold_metrics(Y_rows, cv['proba'])['roc_auc']
+print("\nROC Analysis (out-of-fold):")
+print(f"  - ROC-AUC: {oof_auc:.4f}")
+print(f"  - Optimal Threshold ({THRESHOLD_METRIC}): {best['threshold']:.4f}")
+print(f"  - Sensitivity: {best['sensitivity']:.4f}")
+print(f"  - Specificity: {best['specificity']:.4f}")
+
+print("\n[10/10] Evaluating on the test set...")
+train_proba = model.predict_proba(X_train)[:, 1]
+test_proba = model.predict_proba(X_test)[:, 1]
+train_default = threshold_metrics(Y_train, train_proba)
+test_default = threshold_metrics(Y_test, test_proba)
+test_tuned = threshold_metrics(Y_test, test_proba, best['threshold'])
+
+print("\n" + "=" * 80)
+print("RESULTS - Phase 2")
+print("=" * 80)
+print("\nPerformance (Standard 0.5 threshold):")
+print(f"  ✓ Train Accuracy: {train_default['accuracy']:.4f}")
+print(f"  ✓ Test Accuracy:  {test_default['accuracy']:.4f}")
+print(f"  ✓ Precision:      {test_default['precision']:.4f}")
+print(f"  ✓ Recall:         {test_default['recall']:.4f}")
+print(f"  ✓ ROC-AUC:        {test_default['roc_auc']:.4f}")
+
+print(f"\nPerformance (Optimized Threshold {best['threshold']:.4f}):")
+print(f"  ✓ Test Accuracy:  {test_tuned['accuracy']:.4f}")
+print(f"  ✓ Precision:      {test_tuned['precision']:.4f}")
+print(f"  ✓ Recall:         {test_tuned['recall']:.4f}")
+print(f"  ✓ F1-Score:       {test_tuned['f1']:.4f}")
+
+print("\nModel Architecture:")
+print(f"  ✓ Input features: {len(feature_cols)}")
+print("  ✓ Layers: 128-64-32-16-8-2")
+print(f"  ✓ Parameters: {sum(w.size for w in model.coefs_) + sum(b.size for b in model.intercepts_):,}")
+
+tn, fp, fn, tp = confusion_matrix(Y_test, test_proba >= best['threshold'], labels=[0, 1]).ravel()
+print("\nConfusion Matrix:")
+print(f"  - TN: {tn}, FP: {fp}")
+print(f"  - FN: {fn}, TP: {tp}")
+
+print("\nSaving files...")
+pickle.dump(model, open('model_phase2.pkl', 'wb'))
+pickle.dump(scaler, open('scaler_phase2.pkl', 'wb'))
+# Loaded by model_registry: the served Phase 2 predictor uses optimal_threshold
+threshold_info = {
+    'optimal_threshold': best['threshold'],
+    'threshold_metric': THRESHOLD_METRIC,
+    'sensitivity': best['sensitivity'],
+    'specificity': best['specificity'],
+    'roc_auc': test_default['roc_auc'],
+    'features': feature_cols,
+    'feature_count': len(feature_cols),
+    'base_features': BASE_FEATURES,
+    'trend_features': TREND_FEATURES,
+    'trend_definition': TREND_DEFINITION,
+}
+pickle.dump(threshold_info, open('threshold_info.pkl', 'wb'))
+print("✓ model_phase2.pkl")
+print("✓ scaler_phase2.pkl")
+print("✓ threshold_info.pkl")
+
+# Plot 1: CV metrics per fold
+fig, ax = plt.subplots(figsize=(10, 6))
+means = [np.nanmean(cv_scores[name]) for name in CV_METRICS]
+stds = [np.nanstd(cv_scores[name]) for name in CV_METRICS]
+ax.bar([name.upper() for name in CV_METRICS], means, yerr=stds, capsize=6, color='steelblue')
+ax.set_ylim(0, 1.05)
+ax.set_ylabel('Score')
+ax.set_title(f'Phase 2 - {N_SPLITS}-Fold Cross-Validation')
+ax.grid(True, axis='y', alpha=0.3)
+plt.tight_layout()
+plt.savefig('cv_results_phase2.png', dpi=300, bbox_inches='tight')
+print("✓ Saved: cv_results_phase2.png")
+
+# Plot 2: ROC curve with the tuned operating point (from the same sweep as the threshold)
+sweep = threshold_sweep(Y_rows, cv['proba'])
+fpr, tpr, _ = roc_curve(Y_test, test_proba)
+fig, ax = plt.subplots(figsize=(8, 6))
+ax.plot(fpr, tpr, linewidth=2, label=f"Test ROC (AUC = {test_default['roc_auc']:.4f})")
+ax.plot(sweep['fp'] / max(sweep['fp'][-1], 1), sweep['tp'] / max(sweep['tp'][-1], 1),
+        linewidth=1, alpha=0.7, label=f'Out-of-fold ROC (AUC = {oof_auc:.4f})')
+ax.scatter([1 - best['specificity']], [best['sensitivity']], color='red', zorder=3,
+           label=f"Threshold {best['threshold']:.4f}")
+ax.plot([0, 1], [0, 1], 'k--', linewidth=1, label='Random Classifier')
+ax.set_xlabel('False Positive Rate')
+ax.set_ylabel('True Positive Rate')
+ax.set_title('Phase 2 MLP - ROC Curve')
+ax.legend()
+ax.grid(True, alpha=0.3)
+plt.tight_layout()
+plt.savefig('roc_curve_phase2.png', dpi=300, bbox_inches='tight')
+print("✓ Saved: roc_curve_phase2.png")
+
+# Plot 3: Precision-recall curve
+precision, recall, _ = precision_recall_curve(Y_test, test_proba)
+fig, ax = plt.subplots(figsize=(8, 6))
+ax.plot(recall, precision, linewidth=2)
+ax.set_xlabel('Recall')
+ax.set_ylabel('Precision')
+ax.set_title('Phase 2 MLP - Precision-Recall Curve')
+ax.grid(True, alpha=0.3)
+plt.tight_layout()
+plt.savefig('precision_recall_phase2.png', dpi=300, bbox_inches='tight')
+print("✓ Saved: precision_recall_phase2.png")
+
+print("\n" + "=" * 80)
+print("✅ PHASE 2 COMPLETE!")
+print("=" * 80 + "\n")
@@ -11,7 +11,6 @@ Features:
 """
 
 import numpy as np
-import pandas as pd
 import pickle
 import warnings
 from sklearn.preprocessing import StandardScaler
@@ -26,6 +25,12 @@ from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from sequence_windows import (forecast_labels, patient_ids, grouped_fill, window_view,
+                              PatientWindowIndex, PATIENT_ID_COLUMN)
+from phase3_dataset import make_window_dataset, split_starts
+from data_cache import load_dataset, dataset_columns
+from lstm_numpy import export_lstm_model, check_export_parity, NumpyLSTMModel
+
 warnings.filterwarnings('ignore')
 
 # ============================================================================
@@ -39,6 +44,8 @@ EPOCHS = 50
 VALIDATION_SPLIT = 0.2
 TEST_SIZE = 0.2
 RANDOM_STATE = 42
+DATASET_CACHE = None  # e.g. '/tmp/phase3_windows' to cache gathered windows on local disk
+EXPORT_PARITY_SAMPLES = 1024  # test windows the NumPy export is checked on
 
 FEATURE_COLUMNS = [
     'HR', 'O2Sat', 'Temp', 'SBP', 'MAP', 'DBP', 'Resp', 'EtCO2', 'BaseExcess', 'HCO3',
@@ -56,10 +63,21 @@ print("PHASE 3: LSTM TIME-SERIES SEPSIS PREDICTION")
 print("="*70 + "\n")
 
 print("[1/6] Loading data...")
-df = pd.read_csv('sepsis.csv')
-
-# Fill missing values with forward fill then backward fill
-df[FEATURE_COLUMNS] = df[FEATURE_COLUMNS].fillna(method='ffill').fillna(method='bfill').fillna(df[FEATURE_COLUMNS].mean())
+# Only the columns the LSTM needs are read from the columnar cache
+columns = FEATURE_COLUMNS + ['SepsisLabel', 'ICULOS']
+if PATIENT_ID_COLUMN in dataset_columns('sepsis.csv'):
+    columns.append(PATIENT_ID_COLUMN)
+df = load_dataset('sepsis.csv', columns=columns)
+
+# Patient boundaries: imputation and windows never cross from one stay into the next
+ids = patient_ids(df)
+if PATIENT_ID_COLUMN in df.columns:
+    order = np.argsort(ids, kind='stable')
+    df = df.iloc[order].reset_index(drop=True)
+    ids = ids[order]
+
+# Fill missing values with forward fill then backward fill, per patient
+df[FEATURE_COLUMNS] = grouped_fill(df, FEATURE_COLUMNS, ids)
 
 X = df[FEATURE_COLUMNS].values
 y = df['SepsisLabel'].values
@@ -74,28 +92,18 @@ print(f"  Non-sepsis cases: {(y == 0).sum()} ({(y == 0).sum()/len(y)*100:.2f}%)"
 
 print("\n[2/6] Creating sequences for temporal modeling...")
 
-def create_sequences(X, y, sequence_length=12):
-    """
-    Create sequences for LSTM input
-    Each sequence: [t-11, t-10, ..., t-1, t] -> predict y[t+1:t+6]
-    """
-    X_seq = []
-    y_seq = []
-    
-    for i in range(len(X) - sequence_length - FORECAST_STEPS + 1):
-        # Input sequence: past 'sequence_length' timesteps
-        X_seq.append(X[i:i + sequence_length])
-        
-        # Target: mean of next FORECAST_STEPS for binary classification
-        future_labels = y[i + sequence_length:i + sequence_length + FORECAST_STEPS]
-        y_seq.append(1 if np.mean(future_labels) > 0.5 else 0)
-    
-    return np.array(X_seq), np.array(y_seq)
+# Index of (patient, start) pairs; the windows themselves are built on demand
+window_index = PatientWindowIndex(ids, SEQUENCE_LENGTH, FORECAST_STEPS)
+sample_starts = window_index.start
 
-X_seq, y_seq = create_sequences(X, y, SEQUENCE_LENGTH)
+# Labels are indexed by window start row, like the window view below
+y_windows = forecast_labels(y, SEQUENCE_LENGTH, FORECAST_STEPS)
+y_seq = y_windows[sample_starts]
+n_samples, n_timesteps, n_features = len(sample_starts), SEQUENCE_LENGTH, len(FEATURE_COLUMNS)
 
-print(f"  Sequences created: {X_seq.shape}")
-print(f"  Sequence shape: (samples={X_seq.shape[0]}, timesteps={X_seq.shape[1]}, features={X_seq.shape[2]})")
+print(f"  Patients: {window_index.n_patients}")
+print(f"  Sequences created: {(n_samples, n_timesteps, n_features)}")
+print(f"  Sequence shape: (samples={n_samples}, timesteps={n_timesteps}, features={n_features})")
 print(f"  Sepsis sequences: {(y_seq == 1).sum()} ({(y_seq == 1).sum()/len(y_seq)*100:.2f}%)")
 
 # ============================================================================
@@ -104,22 +112,19 @@ print(f"  Sepsis sequences: {(y_seq == 1).sum()} ({(y_seq == 1).sum()/len(y_seq)
 
 print("\n[3/6] Scaling and splitting data...")
 
-# Reshape for scaling
-n_samples, n_timesteps, n_features = X_seq.shape
-X_seq_reshaped = X_seq.reshape(-1, n_features)
-
-# Scale features
+# Scale the 2-D rows once; windows are gathered from this matrix by the input pipeline
 scaler = StandardScaler()
-X_seq_scaled = scaler.fit_transform(X_seq_reshaped)
-X_seq_scaled = X_seq_scaled.reshape(n_samples, n_timesteps, n_features)
+X_scaled = scaler.fit_transform(X).astype(np.float32)
 
-# Split data: train/test
-X_train, X_test, y_train, y_test = train_test_split(
-    X_seq_scaled, y_seq, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y_seq
+# Split data: train/test as arrays of window start rows instead of copied tensors
+train_idx, test_idx = train_test_split(
+    sample_starts, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y_seq
 )
+test_idx = np.sort(test_idx)
+y_train, y_test = y_windows[train_idx], y_windows[test_idx]
 
-print(f"  Train set: {X_train.shape}")
-print(f"  Test set: {X_test.shape}")
+print(f"  Train set: {(len(train_idx), n_timesteps, n_features)}")
+print(f"  Test set: {(len(test_idx), n_timesteps, n_features)}")
 print(f"  Train sepsis rate: {(y_train == 1).sum()/len(y_train)*100:.2f}%")
 print(f"  Test sepsis rate: {(y_test == 1).sum()/len(y_test)*100:.2f}%")
 
@@ -185,11 +190,23 @@ print("\n[5/6] Training LSTM model...")
 early_stop = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
 reduce_lr = ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=5, min_lr=1e-6)
 
+# Hold out the last VALIDATION_SPLIT of the training windows (as validation_split did)
+fit_idx, val_idx = split_starts(train_idx, VALIDATION_SPLIT)
+
+# Streaming tf.data pipelines: windows are built on the fly from the 2-D matrix
+train_ds = make_window_dataset(
+    X_scaled, y_windows, fit_idx, SEQUENCE_LENGTH, BATCH_SIZE, shuffle=True, seed=RANDOM_STATE,
+    cache_path=f"{DATASET_CACHE}_train" if DATASET_CACHE else None
+)
+val_ds = make_window_dataset(
+    X_scaled, y_windows, val_idx, SEQUENCE_LENGTH, BATCH_SIZE,
+    cache_path=f"{DATASET_CACHE}_val" if DATASET_CACHE else None
+)
+
 history = model.fit(
-    X_train, y_train,
-    validation_split=VALIDATION_SPLIT,
+    train_ds,
+    validation_data=val_ds,
     epochs=EPOCHS,
-    batch_size=BATCH_SIZE,
     class_weight=class_weight,
     callbacks=[early_stop, reduce_lr],
     verbose=1
@@ -204,7 +221,8 @@ print(f"\nTraining completed in {len(history.history['loss'])} epochs")
 print("\n[6/6] Evaluating on test set...")
 
 # Predictions
-y_pred_proba = model.predict(X_test, verbose=0)
+test_ds = make_window_dataset(X_scaled, None, test_idx, SEQUENCE_LENGTH, BATCH_SIZE)
+y_pred_proba = model.predict(test_ds, verbose=0)
 y_pred = (y_pred_proba > 0.5).astype(int).flatten()
 
 # Metrics
@@ -245,6 +263,12 @@ print(f"{'='*70}\n")
 model.save('model_phase3_lstm.h5')
 print("✓ Saved: model_phase3_lstm.h5")
 
+# TensorFlow-free inference artifact, checked against Keras on held-out test windows
+export_lstm_model(model, 'model_phase3_lstm.npz')
+parity_windows = window_view(X_scaled, SEQUENCE_LENGTH)[test_idx[:EXPORT_PARITY_SAMPLES]]
+parity_diff = check_export_parity(model, NumpyLSTMModel('model_phase3_lstm.npz'), parity_windows)
+print(f"✓ Saved: model_phase3_lstm.npz (max difference vs Keras: {parity_diff:.2e})")
+
 # Save scaler
 pickle.dump(scaler, open('scaler_phase3.pkl', 'wb'))
 print("✓ Saved: scaler_phase3.pkl")
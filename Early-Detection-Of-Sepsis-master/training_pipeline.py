@@ -0,0 +1,460 @@
+"""
+Training Pipeline
+One config-driven pipeline (load, select, balance, split, scale, fit, evaluate, export)
+behind every trainer script. Each stage's output is memoized on disk under a hash of
+its input and its parameters, so changing only the model reuses the preprocessed arrays.
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+from sklearn.discriminant_analysis import LinearDiscriminantAnalysis, QuadraticDiscriminantAnalysis
+from sklearn.ensemble import AdaBoostClassifier, GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from balanced_sampling import BalancedSampler, gather_rows, partial_fit_balanced
+from cross_validation import classification_counts, threshold_metrics
+from data_cache import DEFAULT_SOURCE, LABEL_COLUMN, DatasetCache
+from explainer_artifacts import build_explainer_artifacts, save_artifact
+from incremental_training import predict_proba_rows
+from model_benchmark import benchmark_classifiers, write_report
+from model_registry import BASE_FEATURES
+
+PIPELINE_CACHE_DIR = '.pipeline_cache'
+STAGES = ('load', 'select', 'balance', 'split', 'scale', 'fit', 'evaluate', 'export')
+OBJECTS_NAME = 'objects.pkl'
+MANIFEST_NAME = 'manifest.json'
+# Part of every stage key; bump when the layout of the stage outputs changes
+CACHE_FORMAT = 2
+# Rows gathered from the column cache per scaler partial_fit call
+GATHER_CHUNK_SIZE = 50000
+
+# Estimators a config may name in fit.model / fit.models
+MODEL_CLASSES = {cls.__name__: cls for cls in (
+    MLPClassifier, LogisticRegression, RandomForestClassifier, AdaBoostClassifier,
+    GradientBoostingClassifier, GaussianNB, LinearDiscriminantAnalysis, QuadraticDiscriminantAnalysis,
+)}
+SCALERS = {'standard': StandardScaler}
+
+DEFAULT_CONFIG = {
+    'data': {'path': DEFAULT_SOURCE, 'label': LABEL_COLUMN},
+    # Feature columns by name ('features') or the first N columns of the CSV ('first')
+    'select': {'features': None, 'first': None},
+    # 'upsample': minority rows drawn with replacement up to n_samples (default: majority size)
+    'balance': {'method': 'upsample', 'n_samples': None, 'random_state': 123},
+    'split': {'test_size': 0.20, 'random_state': 0},
+    'scale': {'method': None},
+    # One estimator (model + params), or a list of them under 'models' for a benchmark run.
+    # partial_fit_epochs > 0 trains with partial_fit minibatches instead of fit()
+    'fit': {'model': 'MLPClassifier', 'params': {}, 'models': None, 'n_jobs': None,
+            'partial_fit_epochs': 0, 'batch_size': 256, 'seed': 0},
+    'evaluate': {'threshold': 0.5},
+    'export': {'model': None, 'scaler': None, 'explainer_artifacts': False, 'report': None},
+}
+
+MLP40_PARAMS = {
+    'activation': 'tanh',
+    'solver': 'lbfgs',
+    'early_stopping': False,
+    'hidden_layer_sizes': [40, 10, 10, 10, 10, 2],
+    'random_state': 1,
+    'batch_size': 'auto',
+    'max_iter': 13000,
+    'learning_rate_init': 1e-5,
+    'tol': 1e-4,
+}
+
+PHASE1_PARAMS = {
+    'activation': 'relu',
+    'solver': 'adam',
+    'early_stopping': True,
+    'validation_fraction': 0.1,
+    'n_iter_no_change': 50,
+    'hidden_layer_sizes': [64, 32, 16, 8, 2],
+    'random_state': 1,
+    'batch_size': 'auto',
+    'max_iter': 20000,
+    'learning_rate': 'adaptive',
+    'learning_rate_init': 1e-4,
+    'tol': 1e-4,
+    'verbose': 1,
+}
+
+# Partial configs, merged over DEFAULT_CONFIG; one per former trainer script
+PRESETS = {
+    # train_model.py: first 40 columns, lbfgs MLP
+    'mlp40': {
+        'select': {'first': 40},
+        'balance': {'n_samples': 37945},
+        'fit': {'params': dict(MLP40_PARAMS, verbose=1)},
+        'export': {'model': 'model.pkl'},
+    },
+    # sepsis1.py: as mlp40 with a 5000-iteration budget
+    'sepsis1': {
+        'select': {'first': 40},
+        'balance': {'n_samples': 37945},
+        'fit': {'params': dict(MLP40_PARAMS, max_iter=5000)},
+        'export': {'model': 'model.pkl'},
+    },
+    # train_model_27features.py: the 27 serving features, StandardScaler, adam MLP
+    'phase1': {
+        'select': {'features': BASE_FEATURES},
+        'scale': {'method': 'standard'},
+        'fit': {'params': PHASE1_PARAMS},
+        'export': {'model': 'model.pkl', 'scaler': 'scaler.pkl', 'explainer_artifacts': True},
+    },
+    # sepsis_lr.py: classifier comparison on the mlp40 split
+    'benchmark': {
+        'select': {'first': 40},
+        'balance': {'n_samples': 37945},
+        'fit': {'models': [
+            {'model': 'MLPClassifier', 'params': MLP40_PARAMS},
+            {'model': 'AdaBoostClassifier', 'params': {}},
+            {'model': 'GradientBoostingClassifier', 'params': {}},
+            {'model': 'GaussianNB', 'params': {}},
+            {'model': 'LinearDiscriminantAnalysis', 'params': {}},
+            {'model': 'QuadraticDiscriminantAnalysis', 'params': {}},
+        ]},
+        'export': {'report': 'benchmark_report.json'},
+    },
+}
+
+
+# ============================================================================
+# Config
+# ============================================================================
+
+def merge_config(base, override):
+    """Recursive dict merge; values in override win (lists are replaced, not merged)"""
+    merged = copy.deepcopy(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def preset(name):
+    """Full config of a preset (a fresh copy the caller may edit)"""
+    if name not in PRESETS:
+        raise KeyError(f"Unknown preset: {name} (available: {', '.join(PRESETS)})")
+    return merge_config(DEFAULT_CONFIG, PRESETS[name])
+
+
+def set_option(config, assignment):
+    """
+    Apply a 'section.key=value' override (value parsed as JSON, else kept as a string),
+    e.g. fit.params.max_iter=500
+    """
+    path, _, raw = assignment.partition('=')
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    *parents, leaf = path.split('.')
+    node = config
+    for name in parents:
+        node = node.setdefault(name, {})
+    node[leaf] = value
+    return config
+
+
+def build_model(spec):
+    """Unfitted estimator from {'model': class name, 'params': {...}}"""
+    name = spec['model']
+    if name not in MODEL_CLASSES:
+        raise ValueError(f"Unknown model: {name} (available: {', '.join(MODEL_CLASSES)})")
+    # JSON has no tuples; sklearn expects them for e.g. hidden_layer_sizes
+    params = {key: tuple(value) if isinstance(value, list) else value
+              for key, value in spec.get('params', {}).items()}
+    return MODEL_CLASSES[name](**params)
+
+
+# ============================================================================
+# Stage cache
+# ============================================================================
+
+def stage_key(stage, parent_key, params):
+    """Content address of a stage output: hash of its input's key and its parameters"""
+    content = json.dumps([CACHE_FORMAT, stage, parent_key, params], sort_keys=True, default=repr)
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+class StageCache:
+    """
+    Stage outputs on disk, one folder per (stage, key): NumPy arrays as memory-mappable
+    .npy files, everything else pickled, and a manifest written last
+    """
+
+    def __init__(self, cache_dir=PIPELINE_CACHE_DIR, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+
+    def _folder(self, stage, key):
+        return os.path.join(self.cache_dir, f"{stage}-{key}")
+
+    def load(self, stage, key):
+        """Outputs dict, or None when the stage has not been run with this key"""
+        folder = self._folder(stage, key)
+        if not self.enabled or not os.path.exists(os.path.join(folder, MANIFEST_NAME)):
+            return None
+        with open(os.path.join(folder, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        with open(os.path.join(folder, OBJECTS_NAME), 'rb') as f:
+            outputs = pickle.load(f)
+        for name in manifest['arrays']:
+            outputs[name] = np.load(os.path.join(folder, f"{name}.npy"), mmap_mode='r')
+        return outputs
+
+    def save(self, stage, key, outputs):
+        if not self.enabled:
+            return
+        folder = self._folder(stage, key)
+        tmp_folder = folder + '.building'
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        os.makedirs(tmp_folder)
+        arrays = [name for name, value in outputs.items() if isinstance(value, np.ndarray)]
+        for name in arrays:
+            np.save(os.path.join(tmp_folder, f"{name}.npy"), outputs[name])
+        with open(os.path.join(tmp_folder, OBJECTS_NAME), 'wb') as f:
+            pickle.dump({name: value for name, value in outputs.items() if name not in arrays}, f)
+        with open(os.path.join(tmp_folder, MANIFEST_NAME), 'w') as f:
+            json.dump({'stage': stage, 'key': key, 'arrays': arrays}, f, indent=2)
+        shutil.rmtree(folder, ignore_errors=True)
+        os.replace(tmp_folder, folder)
+
+
+# ============================================================================
+# Stages
+# ============================================================================
+
+def select_features(dataset, params, label):
+    """
+    Feature names and encoded labels; the features stay in the column cache and
+    later stages gather only the rows they need
+    """
+    names = resolve_features(params, dataset.columns)
+    y = LabelEncoder().fit_transform(dataset.column(label))
+    return {'y': y, 'feature_names': names}
+
+
+def resolve_features(params, columns):
+    """Feature names from select params: explicit names, or the first N columns"""
+    if params.get('features'):
+        missing = [name for name in params['features'] if name not in columns]
+        if missing:
+            raise KeyError(f"Columns not in the dataset: {missing}")
+        return list(params['features'])
+    if params.get('first'):
+        return list(columns[:params['first']])
+    raise ValueError("select needs 'features' (names) or 'first' (column count)")
+
+
+def balance_rows(y, params):
+    if params['method'] == 'upsample':
+        sampler = BalancedSampler(y, n_samples=params['n_samples'], random_state=params['random_state'])
+        return {'index': sampler.indices()}
+    if params['method'] in (None, 'none'):
+        return {'index': np.arange(len(y))}
+    raise ValueError(f"Unknown balance method: {params['method']}")
+
+
+def split_rows(index, params):
+    idx_train, idx_test = train_test_split(np.asarray(index), test_size=params['test_size'],
+                                           random_state=params['random_state'])
+    return {'idx_train': idx_train, 'idx_test': idx_test}
+
+
+def scale_split(columns, idx_train, params):
+    """Fit the scaler with partial_fit on row chunks gathered from the training rows"""
+    if not params['method']:
+        return {'scaler': None}
+    if params['method'] not in SCALERS:
+        raise ValueError(f"Unknown scaler: {params['method']}")
+    scaler = SCALERS[params['method']]()
+    rows = np.sort(idx_train)  # duplicates included, as fit() on the upsampled rows would see them
+    for start in range(0, len(rows), GATHER_CHUNK_SIZE):
+        scaler.partial_fit(gather_rows(columns, rows[start:start + GATHER_CHUNK_SIZE]))
+    return {'scaler': scaler}
+
+
+def gather_scaled(columns, index, scaler):
+    """Rows of the column cache as one matrix, scaled when a scaler is given"""
+    X = gather_rows(columns, index)
+    return X if scaler is None else scaler.transform(X)
+
+
+def fit_model(columns, outputs, params):
+    y, idx_train, idx_test, scaler = outputs['y'], outputs['idx_train'], outputs['idx_test'], outputs['scaler']
+    if params.get('models'):
+        # Benchmark run: every candidate on the same split, in parallel
+        classifiers = [build_model(spec) for spec in params['models']]
+        results = benchmark_classifiers(classifiers, gather_scaled(columns, idx_train, scaler),
+                                        gather_scaled(columns, idx_test, scaler), y[idx_train],
+                                        y[idx_test], n_jobs=params['n_jobs'], report_path=None)
+        return {'results': results}
+
+    model = build_model(params)
+    if params['partial_fit_epochs']:
+        # Minibatches are gathered from the column cache, so the training rows are
+        # never materialized as one matrix
+        partial_fit_balanced(model, columns, y, BalancedSampler(y), idx_train,
+                             epochs=params['partial_fit_epochs'], batch_size=params['batch_size'],
+                             scaler=scaler, classes=np.unique(y[idx_train]), seed=params['seed'],
+                             fit_scaler=False)
+    else:
+        model.fit(gather_scaled(columns, idx_train, scaler), y[idx_train])
+    return {'model': model}
+
+
+def evaluate_model(model, columns, outputs, params):
+    y, scaler = outputs['y'], outputs['scaler']
+    y_test = y[outputs['idx_test']]
+    proba = predict_proba_rows(model, scaler, columns, outputs['idx_test'])
+    metrics = threshold_metrics(y_test, proba, params['threshold'])
+    # predict() picks the positive class when its probability is above 0.5
+    train_proba = predict_proba_rows(model, scaler, columns, outputs['idx_train'])
+    metrics['train_accuracy'] = float(np.mean((train_proba > 0.5) == y[outputs['idx_train']]))
+    tn, fp, fn, tp = classification_counts(y_test, proba, params['threshold'])
+    metrics.update(tn=tn, fp=fp, fn=fn, tp=tp)
+    return {'metrics': metrics}
+
+
+def export_artifacts(outputs, config):
+    export = config['export']
+    if export['report'] and outputs.get('results') is not None:
+        write_report(outputs['results'], export['report'], n_train=len(outputs['idx_train']),
+                     n_test=len(outputs['idx_test']), n_features=len(outputs['feature_names']))
+    if outputs.get('model') is None:
+        return
+    if export['model']:
+        save_artifact(outputs['model'], export['model'])
+        print(f"✓ Model saved to: {export['model']}")
+    if export['scaler'] and outputs['scaler'] is not None:
+        save_artifact(outputs['scaler'], export['scaler'])
+        print(f"✓ Scaler saved to: {export['scaler']}")
+    if export['explainer_artifacts'] and export['model']:
+        build_explainer_artifacts(config['data']['path'], export['model'], outputs['feature_names'])
+
+
+# ============================================================================
+# Runner
+# ============================================================================
+
+def run_pipeline(config, cache_dir=PIPELINE_CACHE_DIR, use_cache=True):
+    """
+    Run every stage of a config, reusing memoized stage outputs
+
+    Each stage key hashes the previous stage's key with the stage's own config
+    section, so an edit invalidates only the stages from that section on (e.g.
+    fit.params reruns fit and evaluate but reuses select, balance, split and scale).
+    The load stage is keyed by the source file's content hash.
+
+    Args:
+        config: Full config (DEFAULT_CONFIG layout; see preset and merge_config)
+        cache_dir: Stage cache directory
+        use_cache: False recomputes (and does not store) every stage
+
+    Returns:
+        dict: feature_names, labels (encoded label of every row), balanced_index
+        (rows after the balance stage), scaler, model (None for a benchmark run),
+        metrics, results (benchmark runs), keys (stage -> key), cached (stages reused)
+    """
+    config = merge_config(DEFAULT_CONFIG, config)
+    cache = StageCache(cache_dir, enabled=use_cache)
+    outputs, keys, cached = {}, {}, []
+    total = len(STAGES)
+
+    def stage(number, name, parent, params, compute):
+        key = stage_key(name, parent, params)
+        start = time.perf_counter()
+        result = cache.load(name, key)
+        if result is not None:
+            cached.append(name)
+            print(f"[{number}/{total}] {name}: reused ({key})")
+        else:
+            result = compute()
+            cache.save(name, key, result)
+            print(f"[{number}/{total}] {name}: done in {time.perf_counter() - start:.1f} s ({key})")
+        keys[name] = key
+        outputs.update(result)
+        return key
+
+    dataset = DatasetCache(config['data']['path'])
+    keys['load'] = dataset.sha256
+    print(f"[1/{total}] load: {config['data']['path']} ({len(dataset.columns)} columns, {keys['load'][:16]})")
+
+    key = stage(2, 'select', keys['load'], {'select': config['select'], 'label': config['data']['label']},
+                lambda: select_features(dataset, config['select'], config['data']['label']))
+    key = stage(3, 'balance', key, config['balance'],
+                lambda: balance_rows(outputs['y'], config['balance']))
+    key = stage(4, 'split', key, config['split'],
+                lambda: split_rows(outputs['index'], config['split']))
+    # Memory-mapped feature columns: stages gather the rows they need from these
+    columns = [dataset.column(name) for name in outputs['feature_names']]
+    key = stage(5, 'scale', key, config['scale'],
+                lambda: scale_split(columns, outputs['idx_train'], config['scale']))
+    key = stage(6, 'fit', key, config['fit'], lambda: fit_model(columns, outputs, config['fit']))
+    if outputs.get('model') is not None:
+        stage(7, 'evaluate', key, config['evaluate'],
+              lambda: evaluate_model(outputs['model'], columns, outputs, config['evaluate']))
+        print_metrics(outputs['metrics'])
+    print(f"[8/{total}] export")
+    export_artifacts(outputs, config)
+
+    return {
+        'feature_names': outputs['feature_names'],
+        'labels': outputs['y'],
+        'balanced_index': outputs['index'],
+        'scaler': outputs.get('scaler'),
+        'model': outputs.get('model'),
+        'metrics': outputs.get('metrics'),
+        'results': outputs.get('results'),
+        'keys': keys,
+        'cached': cached,
+    }
+
+
+def print_metrics(metrics):
+    print(f"  ✓ Train Accuracy: {metrics['train_accuracy']:.4f}")
+    print(f"  ✓ Test Accuracy:  {metrics['accuracy']:.4f}")
+    print(f"  ✓ Precision:      {metrics['precision']:.4f}")
+    print(f"  ✓ Recall:         {metrics['recall']:.4f}")
+    print(f"  ✓ F1-Score:       {metrics['f1']:.4f}")
+    print(f"  ✓ ROC-AUC:        {metrics['roc_auc']:.4f}")
+    print(f"  • TN: {metrics['tn']}, FP: {metrics['fp']}, FN: {metrics['fn']}, TP: {metrics['tp']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Config-driven sepsis model training')
+    parser.add_argument('--preset', choices=sorted(PRESETS), help='Start from a built-in config')
+    parser.add_argument('--config', help='JSON config file (merged over the preset)')
+    parser.add_argument('--set', action='append', default=[], metavar='SECTION.KEY=VALUE',
+                        help='Override one option, e.g. fit.params.max_iter=500 (repeatable)')
+    parser.add_argument('--cache-dir', default=PIPELINE_CACHE_DIR)
+    parser.add_argument('--no-cache', action='store_true', help='Recompute every stage')
+    parser.add_argument('--show-config', action='store_true', help='Print the resolved config and exit')
+    args = parser.parse_args()
+
+    config = preset(args.preset) if args.preset else copy.deepcopy(DEFAULT_CONFIG)
+    if args.config:
+        with open(args.config) as f:
+            config = merge_config(config, json.load(f))
+    for assignment in args.set:
+        set_option(config, assignment)
+    if args.show_config:
+        print(json.dumps(config, indent=2))
+    else:
+        run_pipeline(config, cache_dir=args.cache_dir, use_cache=not args.no_cache)
@@ -0,0 +1,360 @@
+"""
+Phase 2 Trend Features
+The 1-hour change and rolling volatility of key vitals and labs (TREND_FEATURES), computed
+in batch over whole stays for training and incrementally per patient for serving
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from sequence_windows import group_offsets, grouped_fill
+
+# Vitals and labs with a 1-hour trend and a rolling volatility feature (TREND_FEATURES order)
+TREND_SOURCES = ['HR', 'O2Sat', 'Temp', 'Lactate', 'SBP', 'Creatinine', 'WBC', 'Glucose']
+# Hours in the rolling volatility (population standard deviation) window
+VOLATILITY_WINDOW = 6
+# Recorded in threshold_info.pkl by train_model_phase2.py; the registry only serves a
+# Phase 2 model whose recorded definition matches the features computed here
+TREND_DEFINITION = {'version': 1, 'sources': TREND_SOURCES, 'window': VOLATILITY_WINDOW,
+                    'fill': 'grouped_fill'}
+
+STALE_AFTER = 6 * 3600  # seconds without an update before a patient's state is dropped
+MAX_TRACKED_PATIENTS = 10000
+# Seconds a serving process waits for another one holding the shared store's write lock
+STORE_TIMEOUT = 30
+# Removing values from the running sums leaves rounding residue of about this size
+# (relative to mean^2 per value) where the window is constant; it is snapped to 0
+WELFORD_RESIDUE = 1e-12
+
+
+def trend_feature_names(sources=TREND_SOURCES):
+    """Feature names in model order: <source>_trend_1h, <source>_volatility per source"""
+    return [name for source in sources for name in (f"{source}_trend_1h", f"{source}_volatility")]
+
+
+# ============================================================================
+# Batch mode (training)
+# ============================================================================
+
+def batch_trend_features(values, ids, window=VOLATILITY_WINDOW):
+    """
+    Trend features for every row of an hourly dataset, vectorized over all patients
+
+    Args:
+        values: (rows, sources) gap-filled values, rows of each patient contiguous
+            and in time order
+        ids: Patient identifier per row
+        window: Hours in the volatility window (cut at the start of each stay)
+
+    Returns:
+        (rows, 2 * sources) array in trend_feature_names order
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_rows, n_sources = values.shape
+    offsets = group_offsets(ids)
+    first_row = np.repeat(offsets[:-1], np.diff(offsets))
+    rows = np.arange(n_rows)
+
+    out = np.zeros((n_rows, 2 * n_sources))
+    # Change since the previous hour; 0 on the first hour of a stay
+    delta = np.zeros_like(values)
+    delta[1:] = values[1:] - values[:-1]
+    delta[rows == first_row] = 0
+    out[:, 0::2] = delta
+
+    # Rolling window as a (rows, window) gather, masked where it would reach into
+    # the previous stay; two-pass mean/variance per column keeps it exact
+    lags = rows[:, None] - np.arange(window)[None, :]
+    inside = lags >= first_row[:, None]
+    lags = np.where(inside, lags, rows[:, None])
+    counts = inside.sum(axis=1)
+    for j in range(n_sources):
+        windows = values[lags, j]
+        mean = np.where(inside, windows, 0).sum(axis=1) / counts
+        variance = np.where(inside, (windows - mean[:, None]) ** 2, 0).sum(axis=1) / counts
+        out[:, 2 * j + 1] = np.sqrt(variance)
+    return out
+
+
+def add_trend_features(df, ids, sources=TREND_SOURCES, window=VOLATILITY_WINDOW):
+    """
+    Add the trend feature columns to a dataset of whole stays
+
+    Missing values are filled within each stay first (grouped_fill), so a missing
+    lab never reads as a jump. OnlineTrendFeatures reproduces these values one
+    observation at a time.
+
+    Returns:
+        df with the trend_feature_names(sources) columns added
+    """
+    filled = grouped_fill(df, list(sources), ids)
+    features = batch_trend_features(filled.values, ids, window)
+    for j, name in enumerate(trend_feature_names(sources)):
+        df[name] = features[:, j]
+    return df
+
+
+# ============================================================================
+# Online mode (serving)
+# ============================================================================
+
+class MemoryTrendStore:
+    """
+    Per-patient trend states in this process's memory
+
+    Suitable for a single serving process; forked workers would each keep their
+    own copy (use SqliteTrendStore there).
+    """
+
+    def __init__(self, stale_after=STALE_AFTER, max_patients=MAX_TRACKED_PATIENTS):
+        """
+        Args:
+            stale_after: Seconds without an update before a patient is evicted
+            max_patients: Most patients kept (least recently updated are evicted first)
+        """
+        self.stale_after = stale_after
+        self.max_patients = max_patients
+        self._patients = OrderedDict()  # patient_id -> (state, updated), least recently updated first
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Oldest updates sit at the front, so stale patients are popped from there
+        while self._patients:
+            patient_id, (_, updated) = next(iter(self._patients.items()))
+            if len(self._patients) <= self.max_patients and now - updated <= self.stale_after:
+                break
+            self._patients.pop(patient_id)
+
+    def update(self, patient_id, advance):
+        """
+        Atomically replace a patient's state with advance(state) (state is None for
+        a new patient); advance returns (new_state, result) and result is returned
+        """
+        now = time.monotonic()
+        with self._lock:
+            state, _ = self._patients.pop(patient_id, (None, None))
+            state, result = advance(state)
+            self._patients[patient_id] = (state, now)
+            self._evict(now)
+        return result
+
+    def get(self, patient_id):
+        """A patient's state, or None"""
+        with self._lock:
+            entry = self._patients.get(patient_id)
+            return None if entry is None else entry[0]
+
+    def discard(self, patient_id):
+        with self._lock:
+            self._patients.pop(patient_id, None)
+
+    def __len__(self):
+        return len(self._patients)
+
+
+class SqliteTrendStore:
+    """
+    Per-patient trend states in a SQLite file shared by all serving processes
+
+    gunicorn forks several workers and any of them may receive a patient's next
+    observation, so the state has to live outside the worker. Each update reads,
+    advances and writes the patient's state inside one BEGIN IMMEDIATE transaction,
+    which serializes concurrent updates of the same patient across processes.
+    Connections are opened lazily per process and thread, so a store created
+    before the fork is never shared by two processes.
+    """
+
+    def __init__(self, path, stale_after=STALE_AFTER, max_patients=MAX_TRACKED_PATIENTS,
+                 timeout=STORE_TIMEOUT):
+        """
+        Args:
+            path: SQLite file (created on first use)
+            stale_after: Seconds without an update before a patient is evicted
+            max_patients: Most patients kept (least recently updated are evicted first)
+            timeout: Seconds to wait for another process's write transaction
+        """
+        self.path = path
+        self.stale_after = stale_after
+        self.max_patients = max_patients
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS trend_state "
+                "(patient_id TEXT PRIMARY KEY, state BLOB NOT NULL, updated REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS trend_state_updated ON trend_state (updated)")
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def _evict(self, connection, now):
+        connection.execute("DELETE FROM trend_state WHERE updated < ?", (now - self.stale_after,))
+        excess = connection.execute("SELECT COUNT(*) FROM trend_state").fetchone()[0] - self.max_patients
+        if excess > 0:
+            connection.execute(
+                "DELETE FROM trend_state WHERE patient_id IN "
+                "(SELECT patient_id FROM trend_state ORDER BY updated LIMIT ?)", (excess,)
+            )
+
+    def update(self, patient_id, advance):
+        """
+        Atomically replace a patient's state with advance(state) (state is None for
+        a new patient); advance returns (new_state, result) and result is returned
+        """
+        connection = self._connection()
+        now = time.time()  # wall clock: compared across processes
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT state FROM trend_state WHERE patient_id = ?",
+                                     (str(patient_id),)).fetchone()
+            state, result = advance(None if row is None else pickle.loads(row[0]))
+            connection.execute("INSERT OR REPLACE INTO trend_state VALUES (?, ?, ?)",
+                               (str(patient_id), pickle.dumps(state), now))
+            self._evict(connection, now)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return result
+
+    def get(self, patient_id):
+        """A patient's state, or None"""
+        row = self._connection().execute("SELECT state FROM trend_state WHERE patient_id = ?",
+                                          (str(patient_id),)).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def discard(self, patient_id):
+        self._connection().execute("DELETE FROM trend_state WHERE patient_id = ?", (str(patient_id),))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM trend_state").fetchone()[0]
+
+
+class OnlineTrendFeatures:
+    """
+    Per-patient incremental trend features for hourly observations
+
+    Each patient keeps the last filled value, a window-sized ring buffer and a
+    running mean and sum of squared deviations (Welford, with the oldest value
+    removed once the window is full), so an update costs O(sources) regardless
+    of how long the patient has been in the ICU. Values match add_trend_features
+    on the full stay (to floating-point rounding), including the back-fill of a
+    lab that is first measured some hours into the stay.
+    """
+
+    def __init__(self, sources=TREND_SOURCES, window=VOLATILITY_WINDOW, store=None):
+        """
+        Args:
+            sources: Source columns, in feature order
+            window: Hours in the volatility window
+            store: Where the per-patient states live (default: a MemoryTrendStore;
+                a SqliteTrendStore shares them between processes)
+        """
+        self.sources = list(sources)
+        self.window = window
+        self.store = MemoryTrendStore() if store is None else store
+        self.feature_names = trend_feature_names(self.sources)
+
+    def _vector(self, observation):
+        if isinstance(observation, dict):
+            values = [observation.get(name) for name in self.sources]
+            return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return np.asarray(observation, dtype=np.float64)
+
+    def _new_state(self):
+        n_sources = len(self.sources)
+        return {
+            'hours': 0,
+            'last': np.full(n_sources, np.nan),
+            'ring': np.zeros((self.window, n_sources)),
+            'position': np.zeros(n_sources, dtype=np.int64),
+            'count': np.zeros(n_sources, dtype=np.int64),
+            'mean': np.zeros(n_sources),
+            'm2': np.zeros(n_sources),
+        }
+
+    def _advance(self, state, x):
+        window = self.window
+        columns = np.arange(len(self.sources))
+        last = state['last']
+        seen = ~np.isnan(last)
+        filled = np.where(np.isnan(x), last, x)  # forward fill
+        first = ~seen & ~np.isnan(x)
+
+        delta = np.where(seen, filled - last, 0.0)
+
+        # Sources seen before: push the filled value through the sliding Welford update
+        growing = seen & (state['count'] < window)
+        full = seen & (state['count'] >= window)
+        count, mean, m2 = state['count'], state['mean'], state['m2']
+        if growing.any():
+            count[growing] += 1
+            d = filled[growing] - mean[growing]
+            mean[growing] += d / count[growing]
+            m2[growing] += d * (filled[growing] - mean[growing])
+        if full.any():
+            old = state['ring'][state['position'][full], columns[full]]
+            new = filled[full]
+            old_mean = mean[full]
+            mean[full] = old_mean + (new - old) / window
+            m2[full] += (new - old) * (new - mean[full] + old - old_mean)
+        state['ring'][state['position'][seen], columns[seen]] = filled[seen]
+        state['position'][seen] = (state['position'][seen] + 1) % window
+
+        # First measurement: the batch back-fill gives every earlier hour of the
+        # stay (up to a full window) this value, so the window starts that full
+        if first.any():
+            copies = min(state['hours'] + 1, window)
+            count[first] = copies
+            mean[first] = filled[first]
+            m2[first] = 0.0
+            state['ring'][:copies, columns[first]] = filled[first]
+            state['position'][first] = copies % window
+
+        m2[m2 <= WELFORD_RESIDUE * mean ** 2 * count] = 0.0
+        state['hours'] += 1
+        state['last'] = filled
+        volatility = np.sqrt(np.maximum(np.divide(m2, count, out=np.zeros_like(m2), where=count > 0), 0))
+        features = np.empty(2 * len(self.sources))
+        features[0::2] = delta
+        features[1::2] = volatility
+        return features
+
+    def update(self, patient_id, observation):
+        """
+        Add a patient's next hourly observation (dict or vector of sources; missing
+        values as None/NaN) and return their trend features
+
+        Returns:
+            (2 * sources,) array in feature_names order
+        """
+        x = self._vector(observation)
+
+        def advance(state):
+            state = state or self._new_state()
+            return state, self._advance(state, x)
+
+        return self.store.update(patient_id, advance)
+
+    def observations(self, patient_id):
+        """Hours received for a patient (0 when unknown or evicted)"""
+        state = self.store.get(patient_id)
+        return 0 if state is None else state['hours']
+
+    def discharge(self, patient_id):
+        """Drop a patient's state"""
+        self.store.discard(patient_id)
+
+    def __len__(self):
+        return len(self.store)